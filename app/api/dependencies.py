@@ -1,12 +1,14 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi_clerk_auth import ClerkHTTPBearer
+from starlette.concurrency import run_in_threadpool
 from ..db.models import User
+import functools
+import logging
 import os
+import time
 from types import SimpleNamespace
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# .env is loaded once, by app.db.models (imported above)
 
 # --- IMPORTANT ---
 # Get this from your Clerk Dashboard -> API Keys -> Advanced
@@ -27,30 +29,30 @@ CLERK_AUDIENCE = os.environ.get("CLERK_AUDIENCE", "").strip() or None
 CLERK_VERIFY_AUD = False
 CLERK_VERIFY_ISS = False
 
-# Debug: Print what we loaded
-print(f"DEBUG: CLERK_JWKS_URL={CLERK_JWKS_URL}")
-print(f"DEBUG: CLERK_ISSUER={CLERK_ISSUER}")
-print(f"DEBUG: CLERK_VERIFY_AUD={CLERK_VERIFY_AUD}")
-print(f"DEBUG: CLERK_VERIFY_ISS={CLERK_VERIFY_ISS}")
+logger = logging.getLogger(__name__)
 
+logger.debug(
+    "Clerk config: jwks_url=%s issuer=%s verify_aud=%s verify_iss=%s",
+    CLERK_JWKS_URL, CLERK_ISSUER, CLERK_VERIFY_AUD, CLERK_VERIFY_ISS,
+)
+
+# Probe once for the package's config class; its name differs between
+# fastapi_clerk_auth versions (ClerkConfig or Config).
+try:
+    from fastapi_clerk_auth import ClerkConfig as _ClerkConfig  # type: ignore
+except ImportError:
+    try:
+        from fastapi_clerk_auth import Config as _ClerkConfig  # type: ignore
+    except ImportError:
+        _ClerkConfig = None
+
+
+@functools.lru_cache(maxsize=1)
 def _build_clerk_config():
     """Try to construct the package's documented config object if available.
     Fallback to a SimpleNamespace when the package doesn't expose a config class.
     This allows the code to work across different versions of fastapi_clerk_auth.
     """
-    # Preferred: the package exposes a config class like ClerkConfig or Config
-    try:
-        # Common possible class names
-        from fastapi_clerk_auth import ClerkConfig as _ClerkConfig  # type: ignore
-    except Exception:
-        _ClerkConfig = None
-
-    if _ClerkConfig is None:
-        try:
-            from fastapi_clerk_auth import Config as _ClerkConfig  # type: ignore
-        except Exception:
-            _ClerkConfig = None
-
     # Build config dict with all parameters
     config_kwargs = {
         "jwks_url": CLERK_JWKS_URL,
@@ -71,7 +73,7 @@ def _build_clerk_config():
         try:
             return _ClerkConfig(**config_kwargs)
         except Exception as e:
-            print(f"DEBUG: Failed to create ClerkConfig: {e}")
+            logger.debug("Failed to create ClerkConfig: %s", e)
             # If the package's config signature differs, fall back to SimpleNamespace
             pass
 
@@ -83,8 +85,70 @@ clerk_config = _build_clerk_config()
 clerk_auth_guard = ClerkHTTPBearer(clerk_config)
 
 
-def get_current_user(
-    credentials = Depends(clerk_auth_guard)
+class _TTLCache:
+    """Small in-process cache whose entries expire after `ttl` seconds.
+
+    Entries may carry their own (earlier) expiry. When `maxsize` is reached the
+    oldest entry is evicted. Only touched from the event loop thread, so no
+    locking is needed.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = {}
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, expires_in: float = None):
+        ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+        if ttl <= 0:
+            return
+        if key not in self._data and len(self._data) >= self.maxsize:
+            # dicts keep insertion order, so the first key is the oldest
+            self._data.pop(next(iter(self._data)))
+        self._data[key] = (value, time.monotonic() + ttl)
+
+
+# Verified Clerk credentials keyed by the raw bearer token. A hit skips the
+# JWKS lookup and RSA signature check; entries never outlive the token's `exp`.
+_token_cache = _TTLCache(maxsize=10_000, ttl=60)
+
+# Resolved users keyed by clerk_user_id, so authenticated requests don't pay a
+# users-table round trip each time. The app never changes a user row; a role
+# changed directly in the database takes effect within the TTL.
+_user_cache = _TTLCache(maxsize=10_000, ttl=300)
+
+
+async def get_verified_credentials(request: Request):
+    """Return Clerk credentials for the request, verifying each token only once per TTL."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        # Let the guard produce its usual 401/403 response
+        return await clerk_auth_guard(request)
+
+    credentials = _token_cache.get(token)
+    if credentials is not None:
+        return credentials
+
+    credentials = await clerk_auth_guard(request)
+    if credentials is not None:
+        decoded = getattr(credentials, "decoded", None) or {}
+        exp = decoded.get("exp")
+        expires_in = float(exp) - time.time() if exp else None
+        _token_cache.set(token, credentials, expires_in)
+    return credentials
+
+
+async def get_current_user(
+    credentials = Depends(get_verified_credentials)
 ) -> User:
     """
     Verifies the Clerk token, gets the user from the database,
@@ -101,23 +165,27 @@ def get_current_user(
         # We can try to get the email from the token payload
         email = credentials.decoded.get("email")  # This claim might not exist
         
-        user = User.get_or_create(clerk_user_id, email)
+        user = _user_cache.get(clerk_user_id)
+        if user is None:
+            # The lookup is blocking DB IO; run it in the threadpool so the rest of
+            # this dependency stays on the event loop.
+            user = await run_in_threadpool(User.get_or_create, clerk_user_id, email)
+            _user_cache.set(clerk_user_id, user)
         
         return user
         
     except Exception as e:
         # This catches invalid tokens, expired tokens, and verification failures.
         # Log a concise debug message to help diagnose why Clerk rejected the token.
-        # NOTE: do NOT print the raw token in logs in production. We only log error info.
-        try:
-            # Some exceptions carry useful attributes; include type and message.
-            print(f"DEBUG: Clerk token validation failed ({type(e).__name__}): {str(e)}")
-        except Exception:
-            # Swallow any logging errors to avoid masking the original problem
-            pass
+        # NOTE: do NOT log the raw token. The isEnabledFor guard skips the
+        # formatting entirely unless debug logging is switched on.
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Clerk token validation failed (%s): %s", type(e).__name__, e)
         # Re-raise as HTTP 401 to indicate authentication failure.
         raise HTTPException(status_code=401, detail=f"Invalid authentication token: {e}")
-def get_current_admin_user(
+
+
+async def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
     """
@@ -126,7 +194,7 @@ def get_current_admin_user(
     """
     if current_user.role != "admin":
         raise HTTPException(
-            status_code=status.HTT_FORBIDDEN, 
+            status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized: Admin access required"
         )
     return current_user
\ No newline at end of file
@@ -1,21 +1,81 @@
+import asyncio
+import hashlib
 import os
+import re
 import shutil
+import threading
+import time
 import uuid
+from contextlib import contextmanager
 from pathlib import Path
-from fastapi import APIRouter, Depends, File, UploadFile, BackgroundTasks, HTTPException, Query, Form, Request
+from fastapi import APIRouter, Depends, File, UploadFile, BackgroundTasks, HTTPException, Query, Form, Request, Response
 from typing import List, Optional
 from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 # --- UPDATED IMPORTS for mysql.connector ---
-from ..db.models import get_db, Photo as DBPhoto, Tag, User, get_connection
+from ..db.models import Photo as DBPhoto, Tag, User, get_connection, resolve_upload_path, remove_upload_file
 from ..db.operations import PhotoQueries, TagQueries, Analytics
-from ..ml.tagger import process_image
+from ..ml.worker import enqueue as enqueue_tagging
 from .dependencies import get_current_user, get_current_admin_user # Import dependencies
 # --- END UPDATE ---
 from datetime import datetime, timedelta
-import json
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, manifest writes aren't serialised across processes
+    fcntl = None
 
 router = APIRouter()
 
+# Size of each read when copying an upload to disk (1 MiB)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Time-ordered uuid7 names sort by upload time; Python < 3.14 lacks uuid7, so
+# fall back to random uuid4 (still collision-free)
+_new_file_id = getattr(uuid, "uuid7", uuid.uuid4)
+
+# Uploaded images live here (served at /uploads); created once at import
+UPLOADS_DIR = Path("uploads")
+UPLOADS_DIR.mkdir(exist_ok=True)
+
+# Chunked uploads are staged here until finalized. Kept outside uploads/ so
+# half-finished parts are never served or listed in the manifest.
+UPLOAD_PARTS_DIR = Path(".upload_parts")
+MAX_UPLOAD_CHUNKS = 10_000
+# Parts of an upload that hasn't been finalized within this many seconds are
+# removed by _sweep_upload_parts
+UPLOAD_PARTS_TTL_SECONDS = int(os.getenv("UPLOAD_PARTS_TTL_SECONDS", 24 * 3600))
+# Largest file accepted, whether sent whole or in chunks
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+_UPLOAD_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+# Public gallery responses may be cached briefly and served stale while revalidating
+EXPLORE_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=60"
+# A user's own photos may be kept by their browser but must be revalidated
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def _make_etag(*parts) -> str:
+    """Build a strong ETag from the values that determine a response body"""
+    digest = hashlib.blake2b(":".join(str(part) for part in parts).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """True when the request's If-None-Match header already names `etag`"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == "*" or candidate == etag:
+            return True
+    return False
+
 # (Response Models are unchanged)
 class TagDetail(BaseModel):
     name: str
@@ -23,38 +83,162 @@ class TagDetail(BaseModel):
 # ... (all other response models)
 
 
+def _new_upload_name(original_filename: str) -> str:
+    """Unique on-disk name for an upload, keeping the original extension"""
+    return f"{_new_file_id().hex}{os.path.splitext(original_filename or '')[1]}"
+
+
+def _copy_upload(src, dst, limit: int) -> int:
+    """Copy `src` to `dst` in UPLOAD_CHUNK_SIZE reads; 413 once more than
+    `limit` bytes have been read. Returns the number of bytes copied."""
+    copied = 0
+    while True:
+        block = src.read(UPLOAD_CHUNK_SIZE)
+        if not block:
+            return copied
+        copied += len(block)
+        if copied > limit:
+            raise HTTPException(status_code=413, detail="File too large")
+        dst.write(block)
+
+
 async def save_upload_file(upload_file: UploadFile) -> str:
     """
     Save uploaded file to the uploads/ directory.
     Returns the relative path to the file (e.g., /uploads/filename.jpg)
     """
-    # Create uploads directory if it doesn't exist
-    uploads_dir = Path("uploads")
-    uploads_dir.mkdir(exist_ok=True)
-    
     # Generate unique filename to avoid conflicts
-    file_extension = Path(upload_file.filename).suffix
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = uploads_dir / unique_filename
+    unique_filename = _new_upload_name(upload_file.filename)
+    file_path = UPLOADS_DIR / unique_filename
+    # Stream into a temp file next to the destination, then move it into place
+    # atomically so readers never see a half-written image.
+    tmp_path = UPLOADS_DIR / f"{unique_filename}.part"
     
-    # Save the file
+    # Save the file in fixed-size chunks so memory stays flat for large uploads.
+    # The copy runs in the threadpool so blocking disk IO stays off the event loop.
     try:
-        with file_path.open("wb") as buffer:
-            content = await upload_file.read()
-            buffer.write(content)
+        with tmp_path.open("wb", buffering=0) as buffer:
+            await run_in_threadpool(_copy_upload, upload_file.file, buffer, MAX_UPLOAD_BYTES)
+        os.replace(tmp_path, file_path)
     except Exception as e:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Failed to save file: {str(e)}")
     
     # Return the path that the frontend can use to fetch the image
     return f"/uploads/{unique_filename}"
 
 
-def _regenerate_uploads_manifest():
+# Seconds to wait after an upload before rewriting the manifest, so a burst of
+# uploads is coalesced into a single directory scan
+MANIFEST_DEBOUNCE_SECONDS = 2.0
+# Uploads made through the API are appended to the in-memory manifest; a full
+# directory rescan (to pick up files added or removed by other means) happens
+# at most this often
+MANIFEST_RESCAN_SECONDS = 60.0
+# A tuple so file names can be checked with a single str.endswith() call
+_MANIFEST_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp")
+_manifest_dirty = False
+_manifest_refresh_task = None
+# Serialises manifest rewrites between worker processes (POSIX only)
+MANIFEST_LOCK_PATH = Path(".manifest.lock")
+# Newest-first manifest entries and when they were last rebuilt from disk.
+# Appended to from the event loop and written out from the threadpool.
+_manifest_cache = {"entries": None, "scanned_at": 0.0}
+_manifest_lock = threading.Lock()
+
+
+def _manifest_entry(name: str, mtime: Optional[str]) -> dict:
+    return {
+        "filename": name,
+        "url": f"/uploads/{name}",
+        "uploaded_at": mtime
+    }
+
+
+def _scan_uploads(uploads_dir: Path) -> list:
+    # os.scandir gets the file type from the directory listing itself, so each
+    # entry costs a single stat() call (for the mtime)
+    found = []
+    with os.scandir(uploads_dir) as it:
+        for entry in it:
+            if not entry.name.lower().endswith(_MANIFEST_EXTENSIONS):
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                found.append((entry.name, entry.stat(follow_symlinks=False).st_mtime))
+            except OSError:
+                continue
+    found.sort(key=lambda item: item[1], reverse=True)
+    return [
+        _manifest_entry(name, datetime.fromtimestamp(mtime).isoformat())
+        for name, mtime in found
+    ]
+
+
+def _manifest_add(file_url: str):
+    """Record a newly saved upload in the cached manifest (no disk access)"""
+    name = file_url.rsplit("/", 1)[-1]
+    if not name.lower().endswith(_MANIFEST_EXTENSIONS):
+        return
+    with _manifest_lock:
+        entries = _manifest_cache["entries"]
+        if entries is not None:
+            entries.insert(0, _manifest_entry(name, datetime.now().isoformat()))
+
+
+def _manifest_invalidate():
+    """Force the next manifest refresh to rescan uploads/ (e.g. after a delete)"""
+    with _manifest_lock:
+        _manifest_cache["entries"] = None
+
+
+def _manifest_is_current(manifest_path: Path, dir_mtime_ns: Optional[int]) -> bool:
+    """list.json is stamped with the uploads/ mtime it was built for. If the
+    directory hasn't changed since, no file was added or removed and the scan
+    can be skipped; this holds across restarts and worker processes."""
+    if dir_mtime_ns is None:
+        return False
+    try:
+        return manifest_path.stat().st_mtime_ns == dir_mtime_ns
+    except OSError:
+        return False
+
+
+@contextmanager
+def _manifest_file_lock():
+    if fcntl is None:
+        yield
+        return
+    with open(MANIFEST_LOCK_PATH, "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _dir_mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _regenerate_uploads_manifest(force: bool = False):
     """Scan the `uploads/` directory and write a `list.json` manifest used
     by the frontend. This avoids having an API endpoint and lets the frontend
     fetch a static file at `/uploads/list.json` which is served by StaticFiles.
+
+    Skipped when list.json is already current, unless `force` is set (after
+    an upload or delete made through the API).
     """
-    uploads_dir = Path("uploads")
+    uploads_dir = UPLOADS_DIR
     manifest_path = uploads_dir / "list.json"
     if not uploads_dir.exists():
         try:
@@ -62,36 +246,99 @@ def _regenerate_uploads_manifest():
         except Exception:
             return
 
-    allowed = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp"}
-    files = []
+    # Two stats when nothing changed, e.g. on every startup after the first
+    if not force and _manifest_is_current(manifest_path, _dir_mtime_ns(uploads_dir)):
+        return
+
+    with _manifest_file_lock():
+        # Another worker process may have rewritten it while we waited
+        if not force and _manifest_is_current(manifest_path, _dir_mtime_ns(uploads_dir)):
+            return
+        _write_uploads_manifest(uploads_dir, manifest_path)
+
+
+def _write_uploads_manifest(uploads_dir: Path, manifest_path: Path):
     try:
-        entries = sorted(uploads_dir.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
-        for p in entries:
-            if not p.is_file():
-                continue
-            if p.suffix.lower() not in allowed:
-                continue
-            try:
-                mtime = datetime.fromtimestamp(p.stat().st_mtime).isoformat()
-            except Exception:
-                mtime = None
-            files.append({
-                "filename": p.name,
-                "url": f"/uploads/{p.name}",
-                "uploaded_at": mtime
-            })
+        with _manifest_lock:
+            cached = _manifest_cache["entries"]
+            if cached is not None and time.monotonic() - _manifest_cache["scanned_at"] < MANIFEST_RESCAN_SECONDS:
+                files = list(cached)
+            else:
+                files = None
+        if files is None:
+            files = _scan_uploads(uploads_dir)
+            with _manifest_lock:
+                _manifest_cache["entries"] = list(files)
+                _manifest_cache["scanned_at"] = time.monotonic()
         # Write manifest atomically
         try:
             tmp = manifest_path.with_suffix('.tmp')
-            with tmp.open('w', encoding='utf-8') as fh:
-                json.dump(files, fh)
+            with tmp.open('wb') as fh:
+                fh.write(orjson.dumps(files))
             tmp.replace(manifest_path)
+            # The rename bumped the directory mtime; stamp it on list.json
+            # (see _manifest_is_current)
+            dir_mtime_ns = uploads_dir.stat().st_mtime_ns
+            os.utime(manifest_path, ns=(dir_mtime_ns, dir_mtime_ns))
         except Exception:
             pass
     except Exception:
         return
 
 
+async def _manifest_refresher():
+    """Rewrite the manifest until no further uploads arrived while waiting"""
+    global _manifest_dirty
+    while _manifest_dirty:
+        await asyncio.sleep(MANIFEST_DEBOUNCE_SECONDS)
+        _manifest_dirty = False
+        try:
+            # Forced: a file landing while the previous write was being
+            # stamped would otherwise look already included
+            await run_in_threadpool(_regenerate_uploads_manifest, True)
+            await run_in_threadpool(_sweep_upload_parts)
+        except Exception:
+            # best-effort, the next upload will try again
+            pass
+
+
+async def _schedule_manifest_refresh():
+    """Mark the manifest stale and make sure a single refresher task is running"""
+    global _manifest_dirty, _manifest_refresh_task
+    _manifest_dirty = True
+    if _manifest_refresh_task is None or _manifest_refresh_task.done():
+        _manifest_refresh_task = asyncio.create_task(_manifest_refresher())
+
+
+async def _register_upload(
+    background_tasks: BackgroundTasks,
+    file_path: str,
+    title: Optional[str],
+    description: Optional[str],
+    owner: User,
+):
+    """Create the photo record for a saved file and queue tagging + manifest refresh"""
+    db_photo = await run_in_threadpool(
+        DBPhoto.create,
+        file_path=file_path,
+        title=title,
+        description=description,
+        owner_id=owner.id,
+        caption=None,
+        is_public=False
+    )
+
+    # Hand the photo to the tagging worker thread (will generate tags)
+    enqueue_tagging(db_photo.id, resolve_upload_path(file_path))
+
+    # Refresh the static uploads manifest after the response has been sent;
+    # concurrent uploads are coalesced into one rewrite
+    _manifest_add(file_path)
+    background_tasks.add_task(_schedule_manifest_refresh)
+
+    return db_photo.to_dict(include_tags=True)
+
+
 @router.post("/photos/upload")
 async def upload_photo(
     background_tasks: BackgroundTasks,
@@ -104,28 +351,172 @@ async def upload_photo(
     try:
         # Save file
         file_path = await save_upload_file(file)
-
-        # Create photo record using the new model
-        db_photo = DBPhoto.create(
-            file_path=file_path,
-            title=title or file.filename,
-            description=description,
-            owner_id=current_user.id,
-            caption=None,
-            is_public=False
+        return await _register_upload(
+            background_tasks, file_path, title or file.filename, description, current_user
         )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- Chunked uploads ---
+# Large files can be sent as numbered chunks (in parallel, in any order) and
+# then assembled with /photos/upload/finalize. A failed chunk is simply re-sent,
+# and GET /photos/upload/{upload_id}/chunks tells a client which chunks the
+# server already has so an interrupted upload can resume.
+
+def _upload_parts_dir(user_id: int, upload_id: str) -> Path:
+    if not _UPLOAD_ID_RE.match(upload_id):
+        raise HTTPException(status_code=400, detail="Invalid upload_id")
+    # Scoped per user so one user can't append to or finalize another's upload
+    return UPLOAD_PARTS_DIR / str(user_id) / upload_id
+
+
+def _check_total_chunks(total_chunks: int):
+    if not 1 <= total_chunks <= MAX_UPLOAD_CHUNKS:
+        raise HTTPException(status_code=400, detail="Invalid total_chunks")
+
+
+def _staged_bytes(parts_dir: Path, exclude_index: Optional[int] = None) -> int:
+    """Total size of the chunks already stored for an upload"""
+    if not parts_dir.is_dir():
+        return 0
+    return sum(
+        entry.stat().st_size for entry in os.scandir(parts_dir)
+        if entry.name.isdigit() and int(entry.name) != exclude_index
+    )
+
+
+def _sweep_upload_parts():
+    """Remove chunked uploads that haven't received a chunk within
+    UPLOAD_PARTS_TTL_SECONDS. Storing a chunk renames a file into the upload's
+    directory, which bumps its mtime, so only abandoned uploads go."""
+    if not UPLOAD_PARTS_DIR.is_dir():
+        return
+    cutoff = time.time() - UPLOAD_PARTS_TTL_SECONDS
+    for user_dir in os.scandir(UPLOAD_PARTS_DIR):
+        if not user_dir.is_dir():
+            continue
+        for upload_dir in os.scandir(user_dir.path):
+            try:
+                if upload_dir.is_dir() and upload_dir.stat().st_mtime < cutoff:
+                    shutil.rmtree(upload_dir.path, ignore_errors=True)
+            except OSError:
+                pass
+
 
-        # Queue processing in background (will generate tags)
-        actual_file_path = file_path.lstrip('/').replace('/', os.sep)
-        background_tasks.add_task(process_image, db_photo.id, actual_file_path)
+def _received_chunks(parts_dir: Path) -> List[int]:
+    if not parts_dir.is_dir():
+        return []
+    return sorted(int(entry.name) for entry in os.scandir(parts_dir) if entry.name.isdigit())
 
-        # Regenerate static uploads manifest so the frontend sees the new file
+
+def _assemble_chunks(parts_dir: Path, total_chunks: int, original_filename: str) -> str:
+    """Concatenate chunk files into a new file under uploads/ and drop the parts"""
+    unique_filename = _new_upload_name(original_filename)
+    file_path = UPLOADS_DIR / unique_filename
+    tmp_path = UPLOADS_DIR / f"{unique_filename}.part"
+    try:
+        with tmp_path.open("wb") as out:
+            for index in range(total_chunks):
+                with (parts_dir / f"{index:06d}").open("rb") as part:
+                    shutil.copyfileobj(part, out, UPLOAD_CHUNK_SIZE)
+        os.replace(tmp_path, file_path)
+    except Exception:
         try:
-            _regenerate_uploads_manifest()
-        except Exception:
+            tmp_path.unlink()
+        except OSError:
             pass
+        raise
+
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    return f"/uploads/{unique_filename}"
 
-        return db_photo.to_dict(include_tags=True)
+
+@router.post("/photos/upload/chunk")
+async def upload_photo_chunk(
+    upload_id: str = Form(...),
+    chunk_index: int = Form(...),
+    total_chunks: int = Form(...),
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+):
+    """Store one chunk of a chunked upload"""
+    _check_total_chunks(total_chunks)
+    if not 0 <= chunk_index < total_chunks:
+        raise HTTPException(status_code=400, detail="Invalid chunk_index")
+
+    parts_dir = _upload_parts_dir(current_user.id, upload_id)
+    # The chunks together may not exceed the single-upload cap; a retried
+    # chunk replaces its earlier copy, so that copy doesn't count
+    remaining = MAX_UPLOAD_BYTES - await run_in_threadpool(_staged_bytes, parts_dir, chunk_index)
+    parts_dir.mkdir(parents=True, exist_ok=True)
+
+    # Each chunk gets its own file, so parallel chunks never write to the same
+    # file; the temp name + rename makes a retried chunk replace the old one whole.
+    part_path = parts_dir / f"{chunk_index:06d}"
+    tmp_path = parts_dir / f"{chunk_index:06d}.part"
+    try:
+        with tmp_path.open("wb", buffering=0) as buffer:
+            await run_in_threadpool(_copy_upload, file.file, buffer, remaining)
+        os.replace(tmp_path, part_path)
+    except Exception as e:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Failed to save chunk: {str(e)}")
+
+    return {"upload_id": upload_id, "chunk_index": chunk_index}
+
+
+@router.get("/photos/upload/{upload_id}/chunks")
+async def get_uploaded_chunks(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """List the chunk indexes already received for an upload (for resuming)"""
+    parts_dir = _upload_parts_dir(current_user.id, upload_id)
+    received = await run_in_threadpool(_received_chunks, parts_dir)
+    return {"upload_id": upload_id, "received": received, "chunk_size": UPLOAD_CHUNK_SIZE}
+
+
+@router.post("/photos/upload/finalize")
+async def finalize_chunked_upload(
+    background_tasks: BackgroundTasks,
+    upload_id: str = Form(...),
+    total_chunks: int = Form(...),
+    filename: str = Form(...),
+    current_user: User = Depends(get_current_user),
+    title: Optional[str] = Form(None),
+    description: Optional[str] = Form(None),
+):
+    """Assemble a chunked upload and queue it for processing"""
+    _check_total_chunks(total_chunks)
+    parts_dir = _upload_parts_dir(current_user.id, upload_id)
+
+    received = set(await run_in_threadpool(_received_chunks, parts_dir))
+    missing = [index for index in range(total_chunks) if index not in received]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Missing chunks: {missing[:50]}")
+    # Chunks sent with a larger total_chunks than this would be silently dropped
+    extra = sorted(index for index in received if index >= total_chunks)
+    if extra:
+        raise HTTPException(status_code=400, detail=f"Unexpected chunks beyond total_chunks: {extra[:50]}")
+    # Chunks sent in parallel are each checked against the total before the
+    # others land, so check the assembled size once more
+    if await run_in_threadpool(_staged_bytes, parts_dir) > MAX_UPLOAD_BYTES:
+        await run_in_threadpool(shutil.rmtree, parts_dir, True)
+        raise HTTPException(status_code=413, detail="File too large")
+
+    try:
+        file_path = await run_in_threadpool(_assemble_chunks, parts_dir, total_chunks, filename)
+        return await _register_upload(
+            background_tasks, file_path, title or filename, description, current_user
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -143,16 +534,34 @@ async def get_current_user_info(
     }
 
 # --- NEW ENDPOINT: User's Dashboard ---
-@router.get("/users/me/photos")
+@router.get("/users/me/photos", response_model=None)
 async def list_my_photos(
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
     """List all photos uploaded by the current logged-in user"""
-    photos = DBPhoto.get_by_owner(current_user.id)
-    return [photo.to_dict() for photo in photos]
+    fingerprint = await run_in_threadpool(PhotoQueries.get_owner_fingerprint, current_user.id)
+    etag = _make_etag("me", current_user.id, *fingerprint)
+    headers = {"ETag": etag, "Cache-Control": PRIVATE_CACHE_CONTROL}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    photos = await run_in_threadpool(DBPhoto.get_by_owner, current_user.id)
+    return ORJSONResponse([photo.to_dict() for photo in photos], headers=headers)
+
+def _photos_above_confidence(min_confidence: float, skip: int, limit: int) -> List[DBPhoto]:
+    """One page of photos with at least one tag at or above min_confidence;
+    each photo's tags list holds only those tags"""
+    photos = []
+    for photo, name, confidence in PhotoQueries.get_photos_by_confidence(min_confidence, skip, limit):
+        if not photos or photos[-1] is not photo:
+            photos.append(photo)
+        photo.tags.append({'name': name, 'confidence': confidence})
+    return photos
+
 
 # --- PROTECTED: Admin's Dashboard ---
-@router.get("/photos")
+@router.get("/photos", response_model=None)
 async def list_photos(
     # Allow any authenticated user; admins see all photos, users see only their own
     current_user: User = Depends(get_current_user),
@@ -166,6 +575,8 @@ async def list_photos(
     search: Optional[str] = None,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
+    after_uploaded_at: Optional[datetime] = None,
+    after_id: Optional[int] = None,
 ):
     """
     List all photos in the system (ADMIN ONLY)
@@ -173,45 +584,84 @@ async def list_photos(
     # Admins can use the full set of queries
     if current_user.role == 'admin':
         if tags:
-            photos = PhotoQueries.get_photos_by_tags(tags)
+            photos = await run_in_threadpool(PhotoQueries.get_photos_by_tags, tags)
         elif date_from and date_to:
-            photos = PhotoQueries.get_photos_by_date_range(date_from, date_to)
+            photos = await run_in_threadpool(PhotoQueries.get_photos_by_date_range, date_from, date_to)
         elif min_confidence:
-            photos = PhotoQueries.get_photos_by_confidence(min_confidence)
+            photos = await run_in_threadpool(_photos_above_confidence, min_confidence, skip, limit)
         elif search:
-            photos = DBPhoto.search(search)
+            photos = await run_in_threadpool(DBPhoto.search, search, limit)
         else:
-            photos = DBPhoto.get_all(skip, limit, tag, sort_by, order)
+            # after_uploaded_at/after_id: keyset paging from the previous page's last photo
+            photos = await run_in_threadpool(
+                DBPhoto.get_all, skip, limit, tag, sort_by, order, after_uploaded_at, after_id
+            )
     else:
-        # Regular users only see their own photos
-        photos = DBPhoto.get_by_owner(current_user.id)
-        
-        # Apply simple filters
-        if search:
-            photos = [p for p in photos if search.lower() in (p.title.lower() or '') or 
-                      search.lower() in (p.description.lower() or '') or
-                      search.lower() in (p.caption.lower() or '')]
-        
-        if tag:
-            photos = [p for p in photos if any(t['name'] == tag for t in p.tags)]
-        
-        if tags:
-            photos = [p for p in photos if any(t['name'] in tags for t in p.tags)]
-        
-        # Apply sorting
-        reverse = order == 'desc'
-        if sort_by == 'uploaded_at':
-            photos = sorted(photos, key=lambda p: p.uploaded_at, reverse=reverse)
-        elif sort_by == 'title':
-            photos = sorted(photos, key=lambda p: p.title, reverse=reverse)
-        
-        # Apply pagination
-        photos = photos[skip:skip+limit]
+        # Regular users only see their own photos; filtering, sorting and
+        # pagination all happen in a single SQL query
+        photos = await run_in_threadpool(
+            PhotoQueries.get_for_owner,
+            current_user.id,
+            search=search,
+            tag=tag,
+            tags=tags,
+            sort_by=sort_by,
+            order=order,
+            skip=skip,
+            limit=limit,
+        )
 
-    return [photo.to_dict() for photo in photos]
+    return ORJSONResponse([photo.to_dict() for photo in photos])
+
+
+@router.get("/photos/count")
+async def count_photos(
+    current_user: User = Depends(get_current_user),
+    tag: Optional[str] = None,
+    tags: List[str] = Query(None),
+    search: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 100,
+):
+    """Number of photos /photos returns for the same filters, for pagination.
+    Admins count all photos; users count only their own."""
+    if current_user.role == 'admin':
+        # The admin listing applies one filter at a time; count the same one
+        count = await run_in_threadpool(
+            PhotoQueries.count_admin_listing,
+            search=search,
+            tag=tag,
+            tags=tags,
+            min_confidence=min_confidence,
+            date_from=date_from,
+            date_to=date_to,
+            limit=limit,
+        )
+    else:
+        count = await run_in_threadpool(
+            PhotoQueries.count_photos, current_user.id, search=search, tag=tag, tags=tags
+        )
+    return {"count": count}
 
 
-@router.get("/photos/explore")
+# --- PROTECTED: Admin-Only Action ---
+@router.get("/photos/export")
+async def export_photos(
+    admin_user: User = Depends(get_current_admin_user)
+):
+    """Stream every photo as newline-delimited JSON (ADMIN ONLY)"""
+    def ndjson_lines():
+        for photo in DBPhoto.iter_all():
+            yield orjson.dumps(photo.to_dict()) + b"\n"
+
+    # Starlette iterates a sync generator in its threadpool, so the batched
+    # DB reads stay off the event loop
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/photos/explore", response_model=None)
 async def explore_photos(
     request: Request
 ):
@@ -228,7 +678,7 @@ async def explore_photos(
         except Exception:
             return default
 
-    skip = _parse_int(request.query_params.get("skip"), 0)
+    skip = max(_parse_int(request.query_params.get("skip"), 0), 0)
     limit = _parse_int(request.query_params.get("limit"), 24)
 
     MAX_LIMIT = 100
@@ -236,22 +686,22 @@ async def explore_photos(
         limit = 1
     limit = min(limit, MAX_LIMIT)
 
-    # Get all public photos
-    photos = DBPhoto.get_all(skip, limit, tag)
-    
-    # Filter for only public photos
-    photos = [p for p in photos if p.is_public]
-    
-    if q:
-        photos = [p for p in photos if q.lower() in (p.title.lower() or '')]
-    
-    if tag:
-        photos = [p for p in photos if any(t['name'] == tag for t in p.tags)]
-    
-    # Re-apply pagination after filtering
-    photos = photos[skip:skip+limit]
+    # Browsers and CDNs revalidate with If-None-Match; answer with a bodyless
+    # 304 when nothing public has changed since their copy
+    fingerprint = await run_in_threadpool(PhotoQueries.get_public_fingerprint)
+    etag = _make_etag(*fingerprint, skip, limit, q, tag)
+    headers = {"ETag": etag, "Cache-Control": EXPLORE_CACHE_CONTROL}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
 
-    return [p.to_dict(include_tags=True, anonymize_owner=True) for p in photos]
+    # is_public, the title search and the tag filter are applied in SQL so
+    # skip/limit paginate the filtered result
+    photos = await run_in_threadpool(PhotoQueries.get_public, skip, limit, q, tag)
+
+    return ORJSONResponse(
+        [p.to_dict(include_tags=True, anonymize_owner=True) for p in photos],
+        headers=headers,
+    )
 
 # --- PROTECTED: Admin-Only Action ---
 @router.get("/photos/recent")
@@ -261,7 +711,7 @@ async def get_recent_photos(
     admin_user: User = Depends(get_current_admin_user)
 ):
     """Get recently uploaded photos (ADMIN ONLY)"""
-    photos = PhotoQueries.get_recent_photos(days, limit)
+    photos = await run_in_threadpool(PhotoQueries.get_recent_photos, days, limit)
     return [photo.to_dict() for photo in photos]
 
 # --- PROTECTED: Admin-Only Action ---
@@ -271,7 +721,7 @@ async def get_photo(
     current_user: User = Depends(get_current_user)
 ):
     """Get detailed photo information by ID. Admins can view any photo; users can view their own."""
-    photo = DBPhoto.get_by_id(photo_id)
+    photo = await run_in_threadpool(DBPhoto.get_by_id, photo_id)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
 
@@ -290,7 +740,8 @@ async def update_photo(
     description: Optional[str] = None,
 ):
     """Update photo metadata. Admins can update any photo; users may update their own."""
-    photo = DBPhoto.get_by_id(photo_id)
+    # Only needed for the existence/ownership check, so skip the tags query
+    photo = await run_in_threadpool(DBPhoto.get_by_id, photo_id, include_tags=False)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
 
@@ -303,59 +754,64 @@ async def update_photo(
     if description:
         updates['description'] = description
 
-    updated_photo = DBPhoto.update(photo_id, **updates)
+    # reload=True: the response includes the photo's tags
+    updated_photo = await run_in_threadpool(DBPhoto.update, photo_id, reload=True, **updates)
     return updated_photo.to_dict()
 
 # --- PROTECTED: Admin-Only Action ---
 @router.delete("/photos/{photo_id}")
 async def delete_photo(
     photo_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user)
 ):
     """Delete a photo and its file. Admins can delete any photo; users may delete their own."""
-    photo = DBPhoto.get_by_id(photo_id)
+    photo = await run_in_threadpool(DBPhoto.get_by_id, photo_id, include_tags=False)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
 
     if current_user.role != 'admin' and photo.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this photo")
 
-    DBPhoto.delete(photo_id)
+    # Remove the file after the response is sent; the row is already gone, so
+    # the photo disappears from every listing right away
+    file_path = await run_in_threadpool(DBPhoto.delete, photo_id, remove_file=False)
+    if file_path:
+        background_tasks.add_task(remove_upload_file, file_path)
+
+    # The file is leaving uploads/, so rebuild the manifest from disk (the
+    # refresh task runs after the removal above)
+    _manifest_invalidate()
+    background_tasks.add_task(_schedule_manifest_refresh)
     return {"status": "success", "message": "Photo deleted"}
 
 # --- PROTECTED: Admin-Only Action ---
 @router.post("/photos/{photo_id}/reprocess")
 async def reprocess_photo(
     photo_id: int, 
-    background_tasks: BackgroundTasks, 
     admin_user: User = Depends(get_current_admin_user)
 ):
     """Trigger reprocessing (tagging) for a specific photo (ADMIN ONLY)"""
-    photo = DBPhoto.get_by_id(photo_id)
+    photo = await run_in_threadpool(DBPhoto.get_by_id, photo_id, include_tags=False)
     if not photo:
         raise HTTPException(status_code=404, detail="Photo not found")
 
-    background_tasks.add_task(process_image, photo.id, photo.file_path)
+    enqueue_tagging(photo.id, resolve_upload_path(photo.file_path))
     return {"status": "queued", "photo_id": photo.id}
 
 # --- PROTECTED: Admin-Only Action ---
-@router.get("/tags")
+@router.get("/tags", response_model=None)
 async def list_tags(
     skip: int = 0,
     limit: int = 100,
     admin_user: User = Depends(get_current_admin_user)
 ):
     """List all tags with usage statistics (ADMIN ONLY)"""
-    tags_stats = TagQueries.get_tag_stats()
-    return [
-        {
-            "id": tag.id,
-            "name": tag.name,
-            "photo_count": count,
-            "avg_confidence": float(avg_conf) if avg_conf else None
-        }
-        for tag, count, avg_conf in tags_stats
-    ]
+    # Aggregation and paging happen in SQL; rows are already response-shaped
+    skip = max(skip, 0)
+    limit = min(max(limit, 1), 1000)
+    tags_stats = await run_in_threadpool(TagQueries.get_tag_stats, skip, limit)
+    return ORJSONResponse(tags_stats)
 
 # --- PROTECTED: Admin-Only Action ---
 @router.get("/tags/{tag_name}/related")
@@ -365,7 +821,7 @@ async def get_related_tags(
     admin_user: User = Depends(get_current_admin_user)
 ):
     """Get tags that frequently appear together (ADMIN ONLY)"""
-    related = TagQueries.get_related_tags(tag_name, min_correlation)
+    related = await run_in_threadpool(TagQueries.get_related_tags, tag_name, min_correlation)
     return [
         {
             "tag": tag.name,
@@ -375,15 +831,19 @@ async def get_related_tags(
     ]
 
 # --- PROTECTED: Admin-Only Action ---
-@router.get("/analytics/summary")
+@router.get("/analytics/summary", response_model=None)
 async def get_analytics_summary(
     admin_user: User = Depends(get_current_admin_user)
 ):
     """Get overall analytics summary (ADMIN ONLY)"""
-    upload_stats = Analytics.get_upload_statistics()
-    confidence_dist = Analytics.get_tag_confidence_distribution()
+    # The two aggregates are independent, so run them concurrently on
+    # separate pooled connections instead of back to back
+    upload_stats, confidence_dist = await asyncio.gather(
+        run_in_threadpool(Analytics.get_upload_statistics),
+        run_in_threadpool(Analytics.get_tag_confidence_distribution),
+    )
     
-    return {
+    return ORJSONResponse({
         "upload_stats": [
             {"date": date, "count": count}
             for date, count in upload_stats
@@ -392,4 +852,4 @@ async def get_analytics_summary(
             {"confidence": float(conf), "count": count}
             for conf, count in confidence_dist
         ]
-    }
\ No newline at end of file
+    })
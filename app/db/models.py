@@ -2,7 +2,13 @@
 import mysql.connector
 from mysql.connector import pooling
 from datetime import datetime
+import itertools
+from contextlib import contextmanager
 import os
+from pathlib import Path
+import re
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,45 +17,88 @@ load_dotenv()
 # Database connection pool configuration
 _connection_pool = None
 
+# Pool tuning, overridable from .env. mysql.connector caps a pool at 32
+# connections. Session reset stays on by default: connections run with
+# autocommit off, and skipping the reset would let one borrower's open
+# transaction/snapshot leak into the next.
+MYSQL_POOL_SIZE = min(int(os.getenv('MYSQL_POOL_SIZE', 20)), 32)
+MYSQL_POOL_RESET = os.getenv('MYSQL_POOL_RESET', 'true').lower() in ('1', 'true', 'yes')
+MYSQL_CONN_TIMEOUT = int(os.getenv('MYSQL_CONN_TIMEOUT', 5))
+# How long a caller waits for a free pooled connection before giving up
+MYSQL_POOL_WAIT = float(os.getenv('MYSQL_POOL_WAIT', 5))
+
 def get_connection_pool():
     """Get or initialize the MySQL connection pool"""
     global _connection_pool
     if _connection_pool is None:
         _connection_pool = pooling.MySQLConnectionPool(
             pool_name="campus_lens_pool",
-            pool_size=5,
-            pool_reset_session=True,
-            host=os.getenv('MYSQL_HOST', 'localhost'),
-            user=os.getenv('MYSQL_USER', 'root'),
-            password=os.getenv('MYSQL_PASSWORD', ''),
-            database=os.getenv('MYSQL_DATABASE', 'campus_lens'),
-            port=int(os.getenv('MYSQL_PORT', 3306))
+            # Sized to cover FastAPI's threadpool workers running DB calls
+            # concurrently (MYSQL_POOL_SIZE, default 20)
+            pool_size=MYSQL_POOL_SIZE,
+            pool_reset_session=MYSQL_POOL_RESET,
+            # Use the C extension (CMySQLConnection) so result rows are decoded
+            # in C; mysql.connector falls back to pure Python if it isn't built
+            use_pure=False,
+            connection_timeout=MYSQL_CONN_TIMEOUT,
+            **_mysql_credentials()
         )
     return _connection_pool
 
+def _mysql_credentials():
+    """Server and login settings for the connection pool"""
+    return dict(
+        host=os.getenv('MYSQL_HOST', 'localhost'),
+        user=os.getenv('MYSQL_USER', 'root'),
+        password=os.getenv('MYSQL_PASSWORD', ''),
+        database=os.getenv('MYSQL_DATABASE', 'campus_lens'),
+        port=int(os.getenv('MYSQL_PORT', 3306))
+    )
+
 def get_connection():
-    """Get a connection from the pool"""
+    """Get a connection from the pool.
+
+    mysql.connector raises PoolError immediately when every connection is
+    checked out; wait briefly for one to come back instead of failing the
+    request under a burst of traffic.
+    """
     pool = get_connection_pool()
-    return pool.get_connection()
+    deadline = time.monotonic() + MYSQL_POOL_WAIT
+    delay = 0.005
+    while True:
+        try:
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+@contextmanager
+def db_session():
+    """Borrow one pooled connection for a unit of work spanning several model
+    calls (pass it as `conn=`). Commits on success, rolls back on error."""
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
 # --- Database Helper Functions ---
 
-def dict_from_cursor(cursor):
-    """Convert cursor result to list of dicts"""
-    if cursor.description is None:
-        return []
-    columns = [desc[0] for desc in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
-
-def row_from_cursor(cursor):
-    """Convert single cursor result to dict"""
-    if cursor.description is None:
-        return None
-    columns = [desc[0] for desc in cursor.description]
-    row = cursor.fetchone()
-    if row:
-        return dict(zip(columns, row))
-    return None
+# Working directory at startup; uploads/ lives under it. Cached because it
+# never changes while the app runs.
+_CWD = os.getcwd()
+
+def resolve_upload_path(file_path: str) -> str:
+    """Filesystem path of a stored photo. file_path values look like
+    "/uploads/<name>": URL paths relative to the app directory, not
+    filesystem-absolute paths."""
+    return os.path.join(_CWD, file_path.lstrip('/\\'))
 
 def get_dict_cursor(conn):
     """Get a dictionary cursor from a connection"""
@@ -59,10 +108,54 @@ def get_standard_cursor(conn):
     """Get a standard cursor from a connection"""
     return conn.cursor()
 
+def like_pattern(term: str) -> str:
+    """Build a LIKE pattern matching `term` as a plain substring"""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+# Characters with a meaning in FULLTEXT boolean mode; user input is split on them
+_FULLTEXT_OPERATORS = re.compile(r'[^\w]+', re.UNICODE)
+
+def fulltext_prefix_query(term: str) -> str:
+    """Build a boolean-mode MATCH query requiring every word of `term` as a
+    prefix ("+sun* +beach*"). Words under 3 characters aren't in the index
+    and are dropped; returns "" when nothing indexable is left."""
+    words = [w for w in _FULLTEXT_OPERATORS.split(term) if len(w) >= 3]
+    return ' '.join(f"+{w}*" for w in words)
+
+def load_photo_tags(cursor, photos):
+    """Attach tags to every photo in `photos` using one batched query
+    instead of one query per photo. `cursor` must be a dictionary cursor."""
+    if not photos:
+        return photos
+    by_id = {photo.id: photo for photo in photos}
+    placeholders = ','.join(['%s'] * len(by_id))
+    cursor.execute(
+        f"""SELECT pt.photo_id, t.name, pt.confidence FROM photo_tags pt
+            JOIN tags t ON t.id = pt.tag_id
+            WHERE pt.photo_id IN ({placeholders})""",
+        list(by_id)
+    )
+    for row in cursor.fetchall():
+        by_id[row['photo_id']].tags.append({'name': row['name'], 'confidence': row['confidence']})
+    return photos
+
+def _photo_tag_rows(cursor, photo_id: int) -> list:
+    """One photo's tags as id/name/confidence dicts, read with a dict cursor"""
+    cursor.execute(
+        """SELECT t.id, t.name, pt.confidence FROM tags t
+           JOIN photo_tags pt ON t.id = pt.tag_id
+           WHERE pt.photo_id = %s""",
+        (photo_id,)
+    )
+    return [dict(row) for row in cursor.fetchall()]
+
 # --- User Helper Functions ---
 
 class User:
     """User model - represents a user from Clerk"""
+    __slots__ = ('id', 'clerk_user_id', 'email', 'role')
+
     def __init__(self, id, clerk_user_id, email, role):
         self.id = id
         self.clerk_user_id = clerk_user_id
@@ -84,14 +177,23 @@ class User:
             if row:
                 return User(**row)
             
-            # Create new user
+            # Create new user. Two first requests from the same user can race
+            # here; the upsert makes the loser pick up the winner's row instead
+            # of failing on the clerk_user_id UNIQUE key.
             cursor.execute(
-                "INSERT INTO users (clerk_user_id, email, role) VALUES (%s, %s, %s)",
+                """INSERT INTO users (clerk_user_id, email, role) VALUES (%s, %s, %s)
+                   ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)""",
                 (clerk_user_id, email, 'user')
             )
             conn.commit()
             user_id = cursor.lastrowid
-            return User(user_id, clerk_user_id, email, 'user')
+            if cursor.rowcount == 1:
+                return User(user_id, clerk_user_id, email, 'user')
+            cursor.execute(
+                "SELECT id, clerk_user_id, email, role FROM users WHERE id = %s",
+                (user_id,)
+            )
+            return User(**cursor.fetchone())
         finally:
             cursor.close()
             conn.close()
@@ -116,8 +218,25 @@ class User:
 
 # --- Photo Helper Functions ---
 
+# Columns Photo.update may change, and one UPDATE statement per combination of
+# them (31 in all), built once instead of formatting SQL on every call.
+# Keys list the fields in _PHOTO_UPDATE_FIELDS order.
+_PHOTO_UPDATE_FIELDS = ('title', 'description', 'caption', 'is_public', 'tags_generated')
+_PHOTO_UPDATE_SQL = {
+    combo: f"UPDATE photos SET {', '.join(f'{k} = %s' for k in combo)} WHERE id = %s"
+    for n in range(1, len(_PHOTO_UPDATE_FIELDS) + 1)
+    for combo in itertools.combinations(_PHOTO_UPDATE_FIELDS, n)
+}
+
 class Photo:
     """Photo model"""
+    # Fixed attribute set: no per-instance __dict__, so a page of photos
+    # takes noticeably less memory
+    __slots__ = (
+        'id', 'file_path', 'title', 'description', 'owner_id', 'uploaded_at',
+        'tags_generated', 'caption', 'is_public', 'tags', 'file_url', 'uploaded_at_iso',
+    )
+
     def __init__(self, id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public):
         self.id = id
         self.file_path = file_path
@@ -129,19 +248,20 @@ class Photo:
         self.caption = caption
         self.is_public = is_public
         self.tags = []
+        # Serialized forms, computed once here so to_dict() is a plain dict build
+        self.file_url = file_path if file_path.startswith('/') else f"/{file_path}"
+        self.uploaded_at_iso = uploaded_at.isoformat() if isinstance(uploaded_at, datetime) else uploaded_at
 
     def to_dict(self, include_tags=True, anonymize_owner: bool = False):
         """Convert photo to dictionary"""
-        file_url = self.file_path if self.file_path.startswith('/') else f"/{self.file_path}"
-        
         result = {
             'id': self.id,
-            'file_path': file_url,
-            'file_url': file_url,
+            'file_path': self.file_url,
+            'file_url': self.file_url,
             'title': self.title,
             'description': self.description,
             'owner_id': None if anonymize_owner else self.owner_id,
-            'uploaded_at': self.uploaded_at.isoformat() if isinstance(self.uploaded_at, datetime) else self.uploaded_at,
+            'uploaded_at': self.uploaded_at_iso,
             'tags_generated': self.tags_generated,
             'caption': self.caption,
             'is_public': bool(self.is_public)
@@ -158,25 +278,31 @@ class Photo:
         conn = get_connection()
         cursor = get_standard_cursor(conn)
         try:
+            # uploaded_at comes from the DB server's clock like every other row;
+            # only that column is read back, by primary key on the same cursor
             cursor.execute(
                 """INSERT INTO photos (file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public)
                    VALUES (%s, %s, %s, %s, NOW(), 0, %s, %s)""",
                 (file_path, title, description, owner_id, caption, int(is_public))
             )
-            conn.commit()
             photo_id = cursor.lastrowid
+            cursor.execute("SELECT uploaded_at FROM photos WHERE id = %s", (photo_id,))
+            uploaded_at = cursor.fetchone()[0]
+            conn.commit()
             return Photo(
                 photo_id, file_path, title, description, owner_id,
-                datetime.now(), 0, caption, is_public
+                uploaded_at, 0, caption, is_public
             )
         finally:
             cursor.close()
             conn.close()
 
     @staticmethod
-    def get_by_id(photo_id: int, include_tags: bool = True):
+    def get_by_id(photo_id: int, include_tags: bool = True, conn=None):
         """Get photo by ID with optional tags"""
-        conn = get_connection()
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
         cursor = get_dict_cursor(conn)
         try:
             cursor.execute(
@@ -191,69 +317,116 @@ class Photo:
             photo = Photo(**row)
             
             if include_tags:
-                cursor.execute(
-                    """SELECT t.id, t.name, pt.confidence FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id = %s""",
-                    (photo_id,)
-                )
-                photo.tags = [dict(row) for row in cursor.fetchall()]
+                photo.tags = _photo_tag_rows(cursor, photo_id)
             
             return photo
         finally:
             cursor.close()
-            conn.close()
+            if own_conn:
+                conn.close()
 
     @staticmethod
-    def get_all(skip: int = 0, limit: int = 100, tag: str = None, sort_by: str = "uploaded_at", order: str = "desc"):
-        """Get all photos with filtering and sorting"""
+    def get_all(
+        skip: int = 0,
+        limit: int = 100,
+        tag: str = None,
+        sort_by: str = "uploaded_at",
+        order: str = "desc",
+        after_uploaded_at: datetime = None,
+        after_id: int = None,
+    ):
+        """Get all photos with filtering and sorting.
+
+        Pass the uploaded_at and id of the last photo on the previous page as
+        after_uploaded_at/after_id (with sort_by "uploaded_at") or after_id
+        (with sort_by "id") to page by keyset: the query seeks straight to the
+        next page instead of reading and discarding `skip` rows, which gets
+        slow for deep pages. skip is ignored on that path.
+        """
         conn = get_connection()
         cursor = get_dict_cursor(conn)
         try:
+            where = []
+            params = []
             if tag:
-                query = """SELECT DISTINCT p.id, p.file_path, p.title, p.description, p.owner_id, p.uploaded_at, 
-                           p.tags_generated, p.caption, p.is_public
-                           FROM photos p
-                           JOIN photo_tags pt ON p.id = pt.photo_id
-                           JOIN tags t ON pt.tag_id = t.id
-                           WHERE t.name = %s"""
-                params = [tag]
-            else:
-                query = """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
-                           FROM photos"""
-                params = []
-            
-            # Add sorting
+                where.append("""EXISTS (SELECT 1 FROM photo_tags pt JOIN tags t ON pt.tag_id = t.id
+                                        WHERE pt.photo_id = p.id AND t.name = %s)""")
+                params.append(tag)
+
             valid_sorts = ['uploaded_at', 'title', 'id']
             if sort_by not in valid_sorts:
                 sort_by = 'uploaded_at'
-            query += f" ORDER BY {sort_by} {'DESC' if order == 'desc' else 'ASC'}"
-            
+            direction = 'DESC' if order == 'desc' else 'ASC'
+            cmp = '<' if order == 'desc' else '>'
+
+            keyset = False
+            if sort_by == 'uploaded_at' and after_uploaded_at is not None and after_id is not None:
+                # (uploaded_at, id) past the cursor; served by idx_uploaded,
+                # whose InnoDB entries already end with the primary key
+                where.append(f"(p.uploaded_at {cmp} %s OR (p.uploaded_at = %s AND p.id {cmp} %s))")
+                params.extend([after_uploaded_at, after_uploaded_at, after_id])
+                keyset = True
+            elif sort_by == 'id' and after_id is not None:
+                where.append(f"p.id {cmp} %s")
+                params.append(after_id)
+                keyset = True
+
+            query = """SELECT p.id, p.file_path, p.title, p.description, p.owner_id, p.uploaded_at,
+                       p.tags_generated, p.caption, p.is_public
+                       FROM photos p"""
+            if where:
+                query += f" WHERE {' AND '.join(where)}"
+
+            # id breaks ties so pages are stable
+            query += f" ORDER BY p.{sort_by} {direction}"
+            if sort_by != 'id':
+                query += f", p.id {direction}"
+
             # Add pagination
-            query += " LIMIT %s OFFSET %s"
-            params.extend([limit, skip])
+            if keyset:
+                query += " LIMIT %s"
+                params.append(limit)
+            else:
+                query += " LIMIT %s OFFSET %s"
+                params.extend([limit, skip])
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            photos = []
-            for row in rows:
-                photo = Photo(**row)
-                # Load tags
-                cursor.execute(
-                    """SELECT t.name, pt.confidence FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id = %s""",
-                    (photo.id,)
-                )
-                photo.tags = [dict(tag_row) for tag_row in cursor.fetchall()]
-                photos.append(photo)
-            
-            return photos
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            # Load tags for the whole page in one query
+            return load_photo_tags(cursor, photos)
         finally:
             cursor.close()
             conn.close()
 
+    @staticmethod
+    def iter_all(batch_size: int = 500):
+        """Yield every photo (with tags), oldest first, in batches of
+        `batch_size` rows. Memory stays bounded by one batch however large the
+        table is, and each batch borrows a pooled connection only briefly, so
+        a slow consumer doesn't hold a connection for the whole export."""
+        last_id = 0
+        while True:
+            conn = get_connection()
+            cursor = get_dict_cursor(conn)
+            try:
+                cursor.execute(
+                    """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
+                       FROM photos WHERE id > %s ORDER BY id LIMIT %s""",
+                    (last_id, batch_size)
+                )
+                photos = [Photo(**row) for row in cursor.fetchall()]
+                load_photo_tags(cursor, photos)
+            finally:
+                cursor.close()
+                conn.close()
+
+            if not photos:
+                return
+            yield from photos
+            if len(photos) < batch_size:
+                return
+            last_id = photos[-1].id
+
     @staticmethod
     def get_by_owner(owner_id: int):
         """Get all photos by an owner"""
@@ -265,138 +438,248 @@ class Photo:
                    FROM photos WHERE owner_id = %s ORDER BY uploaded_at DESC""",
                 (owner_id,)
             )
-            rows = cursor.fetchall()
-            
-            photos = []
-            for row in rows:
-                photo = Photo(**row)
-                # Load tags
-                cursor.execute(
-                    """SELECT t.name, pt.confidence FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id = %s""",
-                    (photo.id,)
-                )
-                photo.tags = [dict(tag_row) for tag_row in cursor.fetchall()]
-                photos.append(photo)
-            
-            return photos
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            # Load tags for the whole page in one query
+            return load_photo_tags(cursor, photos)
         finally:
             cursor.close()
             conn.close()
 
     @staticmethod
-    def search(search_term: str):
-        """Search photos by title, description, or caption"""
+    def search(search_term: str, limit: int = 100):
+        """Search photos by title, description, or caption.
+
+        Uses the FULLTEXT index in boolean mode: every word must match, and as
+        a prefix, so "sun" still finds "sunset" like the old LIKE search did.
+        Best matches come first. InnoDB doesn't index words shorter than 3
+        characters, so terms with no longer word fall back to a LIKE scan.
+        """
+        term = search_term.strip()
+        query = fulltext_prefix_query(term)
         conn = get_connection()
         cursor = get_dict_cursor(conn)
         try:
-            cursor.execute(
-                """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
-                   FROM photos WHERE title LIKE %s OR description LIKE %s OR caption LIKE %s""",
-                (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%")
-            )
-            rows = cursor.fetchall()
-            
-            photos = []
-            for row in rows:
-                photo = Photo(**row)
-                # Load tags
+            if query:
                 cursor.execute(
-                    """SELECT t.name, pt.confidence FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id = %s""",
-                    (photo.id,)
+                    """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
+                       FROM photos
+                       WHERE MATCH(title, description, caption) AGAINST (%s IN BOOLEAN MODE)
+                       ORDER BY MATCH(title, description, caption) AGAINST (%s IN BOOLEAN MODE) DESC
+                       LIMIT %s""",
+                    (query, query, limit)
                 )
-                photo.tags = [dict(tag_row) for tag_row in cursor.fetchall()]
-                photos.append(photo)
-            
-            return photos
+            else:
+                pattern = like_pattern(term)
+                cursor.execute(
+                    """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
+                       FROM photos WHERE title LIKE %s OR description LIKE %s OR caption LIKE %s
+                       LIMIT %s""",
+                    (pattern, pattern, pattern, limit)
+                )
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            return load_photo_tags(cursor, photos)
         finally:
             cursor.close()
             conn.close()
 
     @staticmethod
-    def update(photo_id: int, **kwargs):
-        """Update photo attributes"""
-        conn = get_connection()
-        cursor = get_standard_cursor(conn)
+    def update(photo_id: int, *, reload: bool = False, conn=None, **kwargs):
+        """Update photo attributes and return the updated photo.
+
+        The row is re-read on the same connection. Tags aren't changed by an
+        update, so they are only loaded when the caller passes reload=True.
+        """
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        cursor = get_dict_cursor(conn)
         try:
-            allowed_fields = ['title', 'description', 'caption', 'is_public', 'tags_generated']
-            updates = {k: v for k, v in kwargs.items() if k in allowed_fields}
-            
-            if not updates:
-                return Photo.get_by_id(photo_id)
-            
-            set_clause = ", ".join([f"{k} = %s" for k in updates.keys()])
-            query = f"UPDATE photos SET {set_clause} WHERE id = %s"
-            params = list(updates.values()) + [photo_id]
-            
-            cursor.execute(query, params)
-            conn.commit()
+            fields = tuple(k for k in _PHOTO_UPDATE_FIELDS if k in kwargs)
             
-            return Photo.get_by_id(photo_id)
+            if fields:
+                params = [kwargs[k] for k in fields] + [photo_id]
+                cursor.execute(_PHOTO_UPDATE_SQL[fields], params)
+                if own_conn:
+                    conn.commit()
+
+            cursor.execute(
+                """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
+                   FROM photos WHERE id = %s""",
+                (photo_id,)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            photo = Photo(**row)
+            if reload:
+                # Same tag shape as get_by_id (id, name, confidence)
+                photo.tags = _photo_tag_rows(cursor, photo_id)
+            return photo
         finally:
             cursor.close()
-            conn.close()
+            if own_conn:
+                conn.close()
 
     @staticmethod
-    def delete(photo_id: int):
-        """Delete photo and its file"""
+    def delete(photo_id: int, remove_file: bool = True):
+        """Delete photo and its file.
+
+        Returns the filesystem path of the photo's file (None if there was no
+        such photo). With remove_file=False the file is left for the caller to
+        remove, e.g. from a background task via remove_upload_file().
+        """
         conn = get_connection()
-        cursor = get_dict_cursor(conn)
+        cursor = get_standard_cursor(conn)
         try:
             # Get file path first
             cursor.execute("SELECT file_path FROM photos WHERE id = %s", (photo_id,))
             row = cursor.fetchone()
             
-            if row:
-                file_path = row['file_path']
-                # Try to delete file
-                try:
-                    file_full_path = file_path if os.path.isabs(file_path) else os.path.join(os.getcwd(), file_path)
-                    if os.path.exists(file_full_path):
-                        os.remove(file_full_path)
-                except Exception:
-                    pass
-            
-            # Delete from database
-            cursor = get_standard_cursor(conn)
+            # Delete from database (photo_tags rows go with it via ON DELETE CASCADE)
             cursor.execute("DELETE FROM photos WHERE id = %s", (photo_id,))
             conn.commit()
         finally:
             cursor.close()
             conn.close()
 
+        if not row:
+            return None
+        # Remove the file only once the row is really gone, so a failed delete
+        # never leaves a photo pointing at a missing image
+        path = resolve_upload_path(row[0])
+        if remove_file:
+            remove_upload_file(path)
+        return path
+
+def remove_upload_file(path: str):
+    """Delete a stored photo file; a file that is already gone is not an error"""
+    try:
+        Path(path).unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Could not remove {path}: {e}")
+
 # --- Tag Helper Functions ---
 
+# Process-local tag name -> id cache. Auto-tagging produces the same few hundred
+# words over and over, so most lookups never reach MySQL. Must be cleared
+# whenever tags are deleted (see TagQueries.cleanup_unused_tags).
+_TAG_ID_CACHE_SIZE = 4096
+_tag_id_cache = {}
+_tag_id_cache_lock = threading.Lock()
+
+# Rows per multi-row INSERT when attaching tags
+_TAG_INSERT_BATCH = 50
+
+def clear_tag_cache():
+    """Forget all cached tag ids"""
+    with _tag_id_cache_lock:
+        _tag_id_cache.clear()
+
 class Tag:
     """Tag model"""
+    __slots__ = ('id', 'name', 'created_at')
+
     def __init__(self, id, name, created_at=None):
         self.id = id
         self.name = name
         self.created_at = created_at
 
     @staticmethod
-    def get_or_create(name: str):
-        """Get tag by name or create if doesn't exist"""
-        conn = get_connection()
-        cursor = get_dict_cursor(conn)
+    def get_or_create(name: str, conn=None):
+        """Get tag by name or create if doesn't exist.
+        The returned Tag has no created_at; callers only need the id."""
+        tag_id = _tag_id_cache.get(name)
+        if tag_id is not None:
+            return Tag(tag_id, name)
+
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        cursor = get_standard_cursor(conn)
         try:
-            cursor.execute("SELECT id, name, created_at FROM tags WHERE name = %s", (name,))
-            row = cursor.fetchone()
-            if row:
-                return Tag(**row)
-            
-            # Create new tag
-            cursor = get_standard_cursor(conn)
-            cursor.execute("INSERT INTO tags (name, created_at) VALUES (%s, NOW())", (name,))
-            conn.commit()
+            # One atomic statement for both cases: on a duplicate name,
+            # LAST_INSERT_ID(id) makes lastrowid report the existing row's id
+            cursor.execute(
+                """INSERT INTO tags (name, created_at) VALUES (%s, NOW())
+                   ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)""",
+                (name,)
+            )
             tag_id = cursor.lastrowid
-            return Tag(tag_id, name, datetime.now())
+            if own_conn:
+                conn.commit()
+            elif cursor.rowcount == 1:
+                # Inserted inside the caller's transaction, which may still roll
+                # back; don't cache an id that might never be committed
+                return Tag(tag_id, name)
+            with _tag_id_cache_lock:
+                if len(_tag_id_cache) >= _TAG_ID_CACHE_SIZE:
+                    _tag_id_cache.pop(next(iter(_tag_id_cache)))
+                _tag_id_cache[name] = tag_id
+            return Tag(tag_id, name)
         finally:
             cursor.close()
-            conn.close()
+            if own_conn:
+                conn.close()
+
+    @staticmethod
+    def resolve_ids(names, conn=None) -> dict:
+        """Map tag names to ids, creating the tags that don't exist yet.
+        Uncached names cost one SELECT, plus one multi-row INSERT IGNORE and
+        one re-SELECT when some of them are new."""
+        ids = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            tag_id = _tag_id_cache.get(name)
+            if tag_id is None:
+                missing.append(name)
+            else:
+                ids[name] = tag_id
+        if not missing:
+            return ids
+
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
+        cursor = get_standard_cursor(conn)
+        try:
+            cursor.execute(
+                f"SELECT name, id FROM tags WHERE name IN ({','.join(['%s'] * len(missing))})",
+                missing
+            )
+            existing = dict(cursor.fetchall())
+            new = [name for name in missing if name not in existing]
+            created = {}
+            if new:
+                cursor.execute(
+                    "INSERT IGNORE INTO tags (name, created_at) VALUES "
+                    + ','.join(['(%s, NOW())'] * len(new)),
+                    new
+                )
+                # Locking read: sees rows another transaction committed after
+                # this one's snapshot (those names were skipped by IGNORE)
+                cursor.execute(
+                    f"""SELECT name, id FROM tags WHERE name IN ({','.join(['%s'] * len(new))})
+                        LOCK IN SHARE MODE""",
+                    new
+                )
+                created = dict(cursor.fetchall())
+            if own_conn:
+                conn.commit()
+            # Rows inserted inside the caller's transaction may still roll
+            # back; only cache ids that are known to be committed
+            cacheable = {**existing, **created} if own_conn else existing
+            with _tag_id_cache_lock:
+                for name, tag_id in cacheable.items():
+                    if len(_tag_id_cache) >= _TAG_ID_CACHE_SIZE:
+                        _tag_id_cache.pop(next(iter(_tag_id_cache)))
+                    _tag_id_cache[name] = tag_id
+            ids.update(existing)
+            ids.update(created)
+            return ids
+        finally:
+            cursor.close()
+            if own_conn:
+                conn.close()
 
     @staticmethod
     def get_all(skip: int = 0, limit: int = 100):
@@ -415,29 +698,58 @@ class Tag:
             conn.close()
 
     @staticmethod
-    def add_to_photo(photo_id: int, tag_id: int, confidence: float):
+    def add_to_photo(photo_id: int, tag_id: int, confidence: float, conn=None):
         """Add tag to photo with confidence score"""
-        conn = get_connection()
+        Tag.add_many_to_photo(photo_id, [(tag_id, confidence)], conn=conn)
+
+    @staticmethod
+    def add_many_to_photo(photo_id: int, pairs, replace: bool = False, conn=None) -> int:
+        """Add (tag_id, confidence) pairs to a photo on one connection with one commit.
+        With replace=True the photo's existing tags are removed in the same transaction."""
+        own_conn = conn is None
+        if own_conn:
+            conn = get_connection()
         cursor = get_standard_cursor(conn)
         try:
-            cursor.execute(
-                """INSERT INTO photo_tags (photo_id, tag_id, confidence, created_at)
-                   VALUES (%s, %s, %s, NOW())
-                   ON DUPLICATE KEY UPDATE confidence = %s, created_at = NOW()""",
-                (photo_id, tag_id, confidence, confidence)
-            )
-            conn.commit()
+            if replace:
+                cursor.execute("DELETE FROM photo_tags WHERE photo_id = %s", (photo_id,))
+            rows = [(photo_id, tag_id, float(confidence)) for tag_id, confidence in pairs]
+            # executemany rewrites each batch into one multi-row INSERT; batches
+            # of _TAG_INSERT_BATCH keep statements small for large backfills
+            for start in range(0, len(rows), _TAG_INSERT_BATCH):
+                cursor.executemany(
+                    """INSERT INTO photo_tags (photo_id, tag_id, confidence, created_at)
+                       VALUES (%s, %s, %s, NOW())
+                       ON DUPLICATE KEY UPDATE confidence = VALUES(confidence), created_at = NOW()""",
+                    rows[start:start + _TAG_INSERT_BATCH]
+                )
+            if own_conn:
+                conn.commit()
+            return len(pairs)
         finally:
             cursor.close()
-            conn.close()
-
-# --- Simpler Base class for backwards compatibility ---
-class Base:
-    """Placeholder for backwards compatibility with SQLAlchemy-style code"""
-    pass
+            if own_conn:
+                conn.close()
+
+def _ensure_index(cursor, table: str, index_name: str, columns: str, kind: str = ""):
+    """Create an index unless one with that name already exists on the table.
+    `kind` may be e.g. "FULLTEXT" or "UNIQUE"."""
+    cursor.execute(
+        """SELECT 1 FROM information_schema.STATISTICS
+           WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+           LIMIT 1""",
+        (table, index_name)
+    )
+    if cursor.fetchone() is None:
+        cursor.execute(f"CREATE {kind + ' ' if kind else ''}INDEX {index_name} ON {table} {columns}")
+
+_schema_initialized = False
 
 def init_db():
-    """Initialize database and create tables if needed"""
+    """Initialize database and create tables if needed (once per process)"""
+    global _schema_initialized
+    if _schema_initialized:
+        return
     conn = get_connection()
     cursor = conn.cursor()
     try:
@@ -467,7 +779,11 @@ def init_db():
                 is_public TINYINT(1) DEFAULT 0,
                 FOREIGN KEY (owner_id) REFERENCES users(id) ON DELETE CASCADE,
                 INDEX idx_owner (owner_id),
-                INDEX idx_uploaded (uploaded_at)
+                INDEX idx_uploaded (uploaded_at),
+                INDEX idx_public_uploaded (is_public, uploaded_at),
+                INDEX idx_owner_uploaded (owner_id, uploaded_at),
+                INDEX idx_untagged (tags_generated, id),
+                FULLTEXT INDEX idx_photo_text (title, description, caption)
             )
         """)
 
@@ -491,18 +807,36 @@ def init_db():
                 PRIMARY KEY (photo_id, tag_id),
                 FOREIGN KEY (photo_id) REFERENCES photos(id) ON DELETE CASCADE,
                 FOREIGN KEY (tag_id) REFERENCES tags(id) ON DELETE CASCADE,
-                INDEX idx_tag (tag_id)
+                INDEX idx_tag_photo_conf (tag_id, photo_id, confidence)
             )
         """)
 
         # Ensure is_public column exists (migration for older databases)
-        try:
+        cursor.execute(
+            """SELECT 1 FROM information_schema.COLUMNS
+               WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'photos' AND COLUMN_NAME = 'is_public'
+               LIMIT 1"""
+        )
+        if cursor.fetchone() is None:
             cursor.execute("ALTER TABLE photos ADD COLUMN is_public TINYINT(1) DEFAULT 0")
-        except mysql.connector.Error:
-            # Column likely already exists
-            pass
+
+        # Indexes added after the first release; CREATE TABLE IF NOT EXISTS
+        # doesn't touch existing tables, so add them to older databases here.
+        # Public gallery: WHERE is_public = 1 ORDER BY uploaded_at DESC
+        _ensure_index(cursor, "photos", "idx_public_uploaded", "(is_public, uploaded_at)")
+        # A user's own photos: WHERE owner_id = ? ORDER BY uploaded_at DESC
+        _ensure_index(cursor, "photos", "idx_owner_uploaded", "(owner_id, uploaded_at)")
+        # ML backfill: WHERE tags_generated = 0 AND id > ? ORDER BY id
+        _ensure_index(cursor, "photos", "idx_untagged", "(tags_generated, id)")
+        # Admin search: MATCH(title, description, caption) AGAINST (...)
+        _ensure_index(cursor, "photos", "idx_photo_text", "(title, description, caption)", kind="FULLTEXT")
+        # Tag-side lookups (stats, related tags, confidence filters) read only
+        # this index. The photo side is already covered: the primary key
+        # (photo_id, tag_id) is InnoDB's clustered index.
+        _ensure_index(cursor, "photo_tags", "idx_tag_photo_conf", "(tag_id, photo_id, confidence)")
 
         conn.commit()
+        _schema_initialized = True
         return conn, cursor
     except mysql.connector.Error as err:
         print(f"Database initialization error: {err}")
@@ -510,7 +844,3 @@ def init_db():
     finally:
         cursor.close()
         conn.close()
-
-def get_db():
-    """Dependency injection function for FastAPI - returns a connection"""
-    return get_connection()
\ No newline at end of file
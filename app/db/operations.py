@@ -1,11 +1,263 @@
 """
 Database operations and queries module using mysql.connector
 """
-from typing import List, Optional, Tuple
-from .models import Photo, Tag, get_connection, dict_from_cursor, row_from_cursor, get_dict_cursor, get_standard_cursor
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+from .models import Photo, Tag, get_connection, get_dict_cursor, get_standard_cursor, load_photo_tags, clear_tag_cache, like_pattern, fulltext_prefix_query
 from datetime import datetime, timedelta
 
+def _photo_filters(
+    owner_id: Optional[int],
+    search: Optional[str],
+    tag: Optional[str],
+    tags: Optional[List[str]]
+) -> Tuple[List[str], list]:
+    """WHERE clauses (for a `photos p` query) and their parameters for the
+    photo listing filters. `tag` must be present on the photo; `tags` matches any."""
+    where = []
+    params = []
+
+    if owner_id is not None:
+        where.append("p.owner_id = %s")
+        params.append(owner_id)
+
+    if search:
+        pattern = like_pattern(search)
+        where.append("(p.title LIKE %s OR p.description LIKE %s OR p.caption LIKE %s)")
+        params.extend([pattern, pattern, pattern])
+
+    if tag:
+        where.append("""EXISTS (SELECT 1 FROM photo_tags pt JOIN tags t ON pt.tag_id = t.id
+                                WHERE pt.photo_id = p.id AND t.name = %s)""")
+        params.append(tag)
+
+    # A required `tag` that is also in `tags` already satisfies the any-of
+    # filter, so skip that second EXISTS subquery
+    if tags and not (tag and tag in tags):
+        tags = list(dict.fromkeys(tags))
+        placeholders = ','.join(['%s'] * len(tags))
+        where.append(f"""EXISTS (SELECT 1 FROM photo_tags pt JOIN tags t ON pt.tag_id = t.id
+                                 WHERE pt.photo_id = p.id AND t.name IN ({placeholders}))""")
+        params.extend(tags)
+
+    return where or ["1 = 1"], params
+
+def _count_photos(where: List[str], params: list) -> int:
+    """COUNT(*) over `photos p` for WHERE clauses built like _photo_filters'"""
+    conn = get_connection()
+    cursor = get_standard_cursor(conn)
+    try:
+        cursor.execute(
+            f"SELECT COUNT(*) FROM photos p WHERE {' AND '.join(where)}",
+            params
+        )
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        conn.close()
+
+# get_public_fingerprint aggregates every public photo and its tags, so one
+# result is shared by all explore requests for a few seconds. Explore responses
+# are cacheable for longer than that anyway (max-age=30).
+PUBLIC_FINGERPRINT_TTL_SECONDS = 5.0
+_public_fingerprint = None
+_public_fingerprint_lock = threading.Lock()
+
 class PhotoQueries:
+    @staticmethod
+    def get_for_owner(
+        owner_id: int,
+        *,
+        search: Optional[str] = None,
+        tag: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        sort_by: str = "uploaded_at",
+        order: str = "desc",
+        skip: int = 0,
+        limit: int = 100
+    ) -> List[Photo]:
+        """
+        Get one owner's photos with search, tag filters, sorting and pagination
+        applied in SQL. `tag` must be present on the photo; `tags` matches any.
+        """
+        where, params = _photo_filters(owner_id, search, tag, tags)
+
+        valid_sorts = {'uploaded_at': 'p.uploaded_at', 'title': 'p.title'}
+        if sort_by in valid_sorts:
+            order_by = f"{valid_sorts[sort_by]} {'DESC' if order == 'desc' else 'ASC'}"
+        else:
+            order_by = "p.uploaded_at DESC"
+
+        query = f"""SELECT p.id, p.file_path, p.title, p.description, p.owner_id, p.uploaded_at,
+                   p.tags_generated, p.caption, p.is_public
+                   FROM photos p
+                   WHERE {' AND '.join(where)}
+                   ORDER BY {order_by}
+                   LIMIT %s OFFSET %s"""
+        params.extend([limit, skip])
+
+        conn = get_connection()
+        cursor = get_dict_cursor(conn)
+        try:
+            cursor.execute(query, params)
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            return load_photo_tags(cursor, photos)
+        finally:
+            cursor.close()
+            conn.close()
+
+    @staticmethod
+    def count_photos(
+        owner_id: Optional[int] = None,
+        *,
+        search: Optional[str] = None,
+        tag: Optional[str] = None,
+        tags: Optional[List[str]] = None
+    ) -> int:
+        """Count photos matching the listing filters without fetching them.
+        owner_id=None counts across all owners."""
+        where, params = _photo_filters(owner_id, search, tag, tags)
+        return _count_photos(where, params)
+
+    @staticmethod
+    def count_admin_listing(
+        *,
+        search: Optional[str] = None,
+        tag: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        min_confidence: Optional[float] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        limit: int = 100
+    ) -> int:
+        """Count what the admin /photos listing returns for these filters.
+        Only the filter that listing acts on is applied, in the same order:
+        `tags` (any of), then the date range, then min_confidence, then
+        `search` (FULLTEXT like Photo.search, capped at `limit`), then `tag`."""
+        if tags:
+            where, params = _photo_filters(None, None, None, tags)
+        elif date_from and date_to:
+            where = ["p.uploaded_at >= %s", "p.uploaded_at <= %s"]
+            params = [date_from, date_to]
+        elif min_confidence:
+            where = ["EXISTS (SELECT 1 FROM photo_tags pt WHERE pt.photo_id = p.id AND pt.confidence >= %s)"]
+            params = [min_confidence]
+        elif search:
+            term = search.strip()
+            query = fulltext_prefix_query(term)
+            if query:
+                where = ["MATCH(p.title, p.description, p.caption) AGAINST (%s IN BOOLEAN MODE)"]
+                params = [query]
+            else:
+                pattern = like_pattern(term)
+                where = ["(p.title LIKE %s OR p.description LIKE %s OR p.caption LIKE %s)"]
+                params = [pattern, pattern, pattern]
+            return min(_count_photos(where, params), limit)
+        else:
+            where, params = _photo_filters(None, None, tag, None)
+        return _count_photos(where, params)
+
+    @staticmethod
+    def get_public(
+        skip: int = 0,
+        limit: int = 24,
+        q: Optional[str] = None,
+        tag: Optional[str] = None
+    ) -> List[Photo]:
+        """Get public photos, newest first, optionally filtered by title and tag"""
+        where = ["p.is_public = 1"]
+        params = []
+        if q:
+            where.append("p.title LIKE %s")
+            params.append(like_pattern(q))
+        if tag:
+            where.append("""EXISTS (SELECT 1 FROM photo_tags pt JOIN tags t ON pt.tag_id = t.id
+                                    WHERE pt.photo_id = p.id AND t.name = %s)""")
+            params.append(tag)
+        params.extend([limit, skip])
+
+        conn = get_connection()
+        cursor = get_dict_cursor(conn)
+        try:
+            # The public gallery never exposes owners, so owner_id isn't read at all
+            cursor.execute(
+                f"""SELECT p.id, p.file_path, p.title, p.description, NULL AS owner_id, p.uploaded_at,
+                    p.tags_generated, p.caption, p.is_public
+                    FROM photos p
+                    WHERE {' AND '.join(where)}
+                    ORDER BY p.uploaded_at DESC
+                    LIMIT %s OFFSET %s""",
+                params
+            )
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            return load_photo_tags(cursor, photos)
+        finally:
+            cursor.close()
+            conn.close()
+
+    @staticmethod
+    def get_public_fingerprint() -> Tuple:
+        """Summary of the public gallery that changes whenever a public photo
+        is added, removed, edited or re-tagged; used to build ETags. Reused for
+        PUBLIC_FINGERPRINT_TTL_SECONDS, so a change shows up within that long."""
+        global _public_fingerprint
+        with _public_fingerprint_lock:
+            cached = _public_fingerprint
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        fingerprint = PhotoQueries._query_public_fingerprint()
+        with _public_fingerprint_lock:
+            _public_fingerprint = (fingerprint, time.monotonic() + PUBLIC_FINGERPRINT_TTL_SECONDS)
+        return fingerprint
+
+    @staticmethod
+    def _query_public_fingerprint() -> Tuple:
+        # The photos checksum covers the displayed columns and the photo_tags
+        # checksum covers re-tags, which don't touch the photos row
+        conn = get_connection()
+        cursor = get_standard_cursor(conn)
+        try:
+            cursor.execute(
+                """SELECT COUNT(*), MAX(uploaded_at),
+                          COALESCE(BIT_XOR(CRC32(CONCAT_WS('|', id, title, description, caption,
+                                                           tags_generated))), 0),
+                          (SELECT COALESCE(BIT_XOR(CRC32(CONCAT_WS('|', pt.photo_id, pt.tag_id,
+                                                                   pt.confidence))), 0)
+                           FROM photo_tags pt JOIN photos pp ON pt.photo_id = pp.id
+                           WHERE pp.is_public = 1)
+                   FROM photos WHERE is_public = 1"""
+            )
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+    @staticmethod
+    def get_owner_fingerprint(owner_id: int) -> Tuple:
+        """Summary of one owner's photos that changes on any upload, delete, edit
+        or re-tag; used to build ETags. The photos checksum covers the editable
+        columns and the photo_tags checksum covers re-tags, which can change
+        tags without changing the photos row. No serialization involved."""
+        conn = get_connection()
+        cursor = get_standard_cursor(conn)
+        try:
+            cursor.execute(
+                """SELECT COUNT(*), MAX(uploaded_at),
+                          COALESCE(BIT_XOR(CRC32(CONCAT_WS('|', id, title, description, caption,
+                                                           is_public, tags_generated))), 0),
+                          (SELECT COALESCE(BIT_XOR(CRC32(CONCAT_WS('|', pt.photo_id, pt.tag_id,
+                                                                   pt.confidence))), 0)
+                           FROM photo_tags pt JOIN photos pp ON pt.photo_id = pp.id
+                           WHERE pp.owner_id = %s)
+                   FROM photos WHERE owner_id = %s""",
+                (owner_id, owner_id)
+            )
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
     @staticmethod
     def get_photos_by_date_range(
         start_date: datetime,
@@ -20,19 +272,8 @@ class PhotoQueries:
                    FROM photos WHERE uploaded_at >= %s AND uploaded_at <= %s ORDER BY uploaded_at DESC""",
                 (start_date, end_date)
             )
-            rows = cursor.fetchall()
-            photos = []
-            for row in rows:
-                photo = Photo(**row)
-                cursor.execute(
-                    """SELECT t.name, pt.confidence FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id = %s""",
-                    (photo.id,)
-                )
-                photo.tags = [dict(tag_row) for tag_row in cursor.fetchall()]
-                photos.append(photo)
-            return photos
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            return load_photo_tags(cursor, photos)
         finally:
             cursor.close()
             conn.close()
@@ -73,70 +314,92 @@ class PhotoQueries:
                 params = tags
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
-            photos = []
-            for row in rows:
-                photo = Photo(**row)
-                cursor.execute(
-                    """SELECT t.name, pt.confidence FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id = %s""",
-                    (photo.id,)
-                )
-                photo.tags = [dict(tag_row) for tag_row in cursor.fetchall()]
-                photos.append(photo)
-            return photos
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            return load_photo_tags(cursor, photos)
         finally:
             cursor.close()
             conn.close()
 
     @staticmethod
     def get_photos_by_confidence(
-        min_confidence: float = 0.5
-    ) -> List[Tuple[Photo, str, float]]:
-        """Get photos with tags above confidence threshold"""
+        min_confidence: float = 0.5,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Iterator[Tuple[Photo, str, float]]:
+        """Yield (photo, tag_name, confidence) for tags above the threshold,
+        for one page of `limit` photos (newest first) that have such a tag.
+
+        The page is chosen in SQL by walking photos newest first, so only that
+        page's tag rows are joined and sorted. Rows are streamed from the
+        server as they are consumed; a photo's rows arrive together and share
+        one Photo object. The pooled connection is held until the generator is
+        exhausted or closed.
+        """
         conn = get_connection()
         cursor = get_dict_cursor(conn)
         try:
             cursor.execute(
                 """SELECT p.id, p.file_path, p.title, p.description, p.owner_id, p.uploaded_at,
                    p.tags_generated, p.caption, p.is_public, t.name, pt.confidence
-                   FROM photos p
+                   FROM (SELECT p.id, p.file_path, p.title, p.description, p.owner_id, p.uploaded_at,
+                                p.tags_generated, p.caption, p.is_public
+                         FROM photos p
+                         WHERE EXISTS (SELECT 1 FROM photo_tags pt
+                                       WHERE pt.photo_id = p.id AND pt.confidence >= %s)
+                         ORDER BY p.uploaded_at DESC, p.id DESC
+                         LIMIT %s OFFSET %s) p
                    JOIN photo_tags pt ON p.id = pt.photo_id
                    JOIN tags t ON pt.tag_id = t.id
                    WHERE pt.confidence >= %s
-                   ORDER BY p.uploaded_at DESC""",
-                (min_confidence,)
+                   ORDER BY p.uploaded_at DESC, p.id DESC""",
+                (min_confidence, limit, skip, min_confidence)
             )
-            rows = cursor.fetchall()
-            results = []
-            for row in rows:
-                photo = Photo(
-                    row['id'], row['file_path'], row['title'], row['description'],
-                    row['owner_id'], row['uploaded_at'], row['tags_generated'],
-                    row['caption'], row['is_public']
-                )
-                results.append((photo, row['name'], row['confidence']))
-            return results
+            photo = None
+            for row in cursor:
+                if photo is None or photo.id != row['id']:
+                    photo = Photo(
+                        row['id'], row['file_path'], row['title'], row['description'],
+                        row['owner_id'], row['uploaded_at'], row['tags_generated'],
+                        row['caption'], row['is_public']
+                    )
+                yield photo, row['name'], row['confidence']
         finally:
-            cursor.close()
-            conn.close()
+            # A consumer that stops early leaves rows unread on the server;
+            # discard them so closing the cursor can't raise, and return the
+            # connection to the pool even if it does
+            try:
+                conn.consume_results()
+                cursor.close()
+            finally:
+                conn.close()
 
     @staticmethod
-    def get_untagged_photos() -> List[Photo]:
-        """Get photos that haven't been processed by ML yet"""
-        conn = get_connection()
-        cursor = get_dict_cursor(conn)
-        try:
-            cursor.execute(
-                """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
-                   FROM photos WHERE tags_generated = 0"""
-            )
-            rows = cursor.fetchall()
-            return [Photo(**row) for row in rows]
-        finally:
-            cursor.close()
-            conn.close()
+    def get_untagged_photos(batch_size: int = 500) -> Iterator[List[Photo]]:
+        """Yield photos that haven't been processed by ML yet, in batches of
+        up to `batch_size`. Uses keyset paging on id, so each batch is an index
+        seek on (tags_generated, id) and memory stays at one batch."""
+        last_id = 0
+        while True:
+            conn = get_connection()
+            cursor = get_dict_cursor(conn)
+            try:
+                cursor.execute(
+                    """SELECT id, file_path, title, description, owner_id, uploaded_at, tags_generated, caption, is_public
+                       FROM photos WHERE tags_generated = 0 AND id > %s
+                       ORDER BY id LIMIT %s""",
+                    (last_id, batch_size)
+                )
+                photos = [Photo(**row) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+                conn.close()
+
+            if not photos:
+                return
+            yield photos
+            if len(photos) < batch_size:
+                return
+            last_id = photos[-1].id
 
     @staticmethod
     def get_recent_photos(
@@ -153,43 +416,57 @@ class PhotoQueries:
                    FROM photos WHERE uploaded_at >= %s ORDER BY uploaded_at DESC LIMIT %s""",
                 (cutoff, limit)
             )
-            rows = cursor.fetchall()
-            photos = []
-            for row in rows:
-                photo = Photo(**row)
-                cursor.execute(
-                    """SELECT t.name, pt.confidence FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id = %s""",
-                    (photo.id,)
-                )
-                photo.tags = [dict(tag_row) for tag_row in cursor.fetchall()]
-                photos.append(photo)
-            return photos
+            photos = [Photo(**row) for row in cursor.fetchall()]
+            return load_photo_tags(cursor, photos)
         finally:
             cursor.close()
             conn.close()
 
+# get_tag_stats aggregates all of photo_tags, so results are reused for a short
+# while. Keyed by (skip, limit); cleared when tags are deleted.
+TAG_STATS_TTL_SECONDS = 60.0
+_TAG_STATS_CACHE_SIZE = 64
+_tag_stats_cache = {}
+_tag_stats_lock = threading.Lock()
+
+def clear_tag_stats_cache():
+    with _tag_stats_lock:
+        _tag_stats_cache.clear()
+
 class TagQueries:
     @staticmethod
-    def get_tag_stats() -> List[Tuple]:
-        """Get tags with usage count and average confidence"""
+    def get_tag_stats(skip: int = 0, limit: Optional[int] = None) -> List[dict]:
+        """Get tags with usage count and average confidence, most used first.
+        Rows come back as dicts ready to serialize: id, name, photo_count, avg_confidence.
+        Results may be up to TAG_STATS_TTL_SECONDS old."""
+        key = (skip, limit)
+        with _tag_stats_lock:
+            cached = _tag_stats_cache.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+        rows = TagQueries._query_tag_stats(skip, limit)
+        with _tag_stats_lock:
+            if key not in _tag_stats_cache and len(_tag_stats_cache) >= _TAG_STATS_CACHE_SIZE:
+                _tag_stats_cache.clear()
+            _tag_stats_cache[key] = (rows, time.monotonic() + TAG_STATS_TTL_SECONDS)
+        return rows
+
+    @staticmethod
+    def _query_tag_stats(skip: int, limit: Optional[int]) -> List[dict]:
+        sql = """SELECT t.id, t.name, COUNT(pt.photo_id) AS photo_count, AVG(pt.confidence) AS avg_confidence
+                 FROM tags t
+                 LEFT JOIN photo_tags pt ON t.id = pt.tag_id
+                 GROUP BY t.id, t.name
+                 ORDER BY photo_count DESC"""
+        params = []
+        if limit is not None:
+            sql += " LIMIT %s OFFSET %s"
+            params.extend([limit, skip])
         conn = get_connection()
         cursor = get_dict_cursor(conn)
         try:
-            cursor.execute(
-                """SELECT t.id, t.name, COUNT(pt.photo_id) as usage_count, AVG(pt.confidence) as avg_confidence
-                   FROM tags t
-                   LEFT JOIN photo_tags pt ON t.id = pt.tag_id
-                   GROUP BY t.id, t.name
-                   ORDER BY usage_count DESC"""
-            )
-            rows = cursor.fetchall()
-            results = []
-            for row in rows:
-                tag = Tag(row['id'], row['name'])
-                results.append((tag, row['usage_count'], row['avg_confidence']))
-            return results
+            cursor.execute(sql, params)
+            return cursor.fetchall()
         finally:
             cursor.close()
             conn.close()
@@ -203,43 +480,23 @@ class TagQueries:
         conn = get_connection()
         cursor = get_dict_cursor(conn)
         try:
-            # Get the tag ID
-            cursor.execute("SELECT id FROM tags WHERE name = %s", (tag_name,))
-            row = cursor.fetchone()
-            if not row:
-                return []
-            
-            tag_id = row['id']
-            
-            # Find photos with this tag
+            # One self-join: photos carrying the seed tag (pt1) -> the other
+            # tags on those photos (pt2). Both sides walk idx_tag_photo_conf /
+            # the primary key, and the SQL stays the same size however many
+            # photos have the tag.
             cursor.execute(
-                """SELECT photo_id FROM photo_tags WHERE tag_id = %s""",
-                (tag_id,)
+                """SELECT t.id, t.name, COUNT(*) as correlation
+                   FROM tags seed
+                   JOIN photo_tags pt1 ON pt1.tag_id = seed.id
+                   JOIN photo_tags pt2 ON pt2.photo_id = pt1.photo_id AND pt2.tag_id != seed.id
+                   JOIN tags t ON t.id = pt2.tag_id
+                   WHERE seed.name = %s
+                   GROUP BY t.id, t.name
+                   HAVING COUNT(*) >= %s
+                   ORDER BY correlation DESC""",
+                (tag_name, min_correlation)
             )
-            photo_ids = [r['photo_id'] for r in cursor.fetchall()]
-            
-            if not photo_ids:
-                return []
-            
-            # Find other tags on these photos
-            placeholders = ','.join(['%s'] * len(photo_ids))
-            query = f"""SELECT t.id, t.name, COUNT(pt.photo_id) as correlation
-                       FROM tags t
-                       JOIN photo_tags pt ON t.id = pt.tag_id
-                       WHERE pt.photo_id IN ({placeholders}) AND t.id != %s
-                       GROUP BY t.id, t.name
-                       HAVING COUNT(pt.photo_id) >= %s
-                       ORDER BY correlation DESC"""
-            
-            params = photo_ids + [tag_id, min_correlation]
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-            
-            results = []
-            for row in rows:
-                tag = Tag(row['id'], row['name'])
-                results.append((tag, row['correlation']))
-            return results
+            return [(Tag(row['id'], row['name']), row['correlation']) for row in cursor.fetchall()]
         finally:
             cursor.close()
             conn.close()
@@ -263,6 +520,9 @@ class TagQueries:
                 cursor = get_standard_cursor(conn)
                 cursor.execute(f"DELETE FROM tags WHERE id IN ({placeholders})", unused_ids)
                 conn.commit()
+                # Cached name -> id entries may point at the rows just deleted
+                clear_tag_cache()
+                clear_tag_stats_cache()
             
             return len(unused_ids)
         finally:
@@ -276,19 +536,22 @@ class Analytics:
     ) -> List[Tuple]:
         """Get daily upload counts for the last N days"""
         cutoff = datetime.now() - timedelta(days=days)
+        # Half-open [cutoff, tomorrow) range on the bare column: a pure range
+        # scan of idx_uploaded, which also covers the DATE() grouping
+        upper = datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time())
         conn = get_connection()
-        cursor = get_dict_cursor(conn)
+        cursor = get_standard_cursor(conn)
         try:
             cursor.execute(
-                """SELECT DATE(uploaded_at) as date, COUNT(id) as count
+                """SELECT DATE(uploaded_at) as date, COUNT(*) as count
                    FROM photos
-                   WHERE uploaded_at >= %s
+                   WHERE uploaded_at >= %s AND uploaded_at < %s
                    GROUP BY DATE(uploaded_at)
                    ORDER BY DATE(uploaded_at)""",
-                (cutoff,)
+                (cutoff, upper)
             )
-            rows = cursor.fetchall()
-            return [(row['date'], row['count']) for row in rows]
+            # A plain cursor already returns (date, count) tuples
+            return cursor.fetchall()
         finally:
             cursor.close()
             conn.close()
@@ -1,16 +1,23 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException, status, BackgroundTasks
+import stat
+from fastapi import FastAPI, Depends, status, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, Response, FileResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import RedirectResponse, Response, FileResponse, ORJSONResponse
 # --- UPDATED IMPORTS for mysql.connector ---
 # We only need the 'photos' router
 from app.api import photos 
 # --- END UPDATE ---
 from app.ml.tagger import load_models
+from app.ml.worker import start_worker, stop_worker, pending_jobs
 from app.db.models import init_db
 
-app = FastAPI(title="CampusLens API")
+# orjson serializes the photo/tag lists several times faster than stdlib json
+app = FastAPI(title="CampusLens API", default_response_class=ORJSONResponse)
 
 # Serve a tiny default favicon to avoid 404s when no favicon.ico is present.
 # This returns a 1x1 transparent PNG. Replace by placing a real
@@ -21,9 +28,18 @@ _FAVICON_PNG = base64.b64decode(
 )
 
 
+# favicon.ico isn't fingerprinted, so let browsers keep it for a day rather
+# than forever
+_FAVICON_HEADERS = {"Cache-Control": "public, max-age=86400"}
+
+
 @app.get("/favicon.ico")
 async def favicon():
-    return Response(content=_FAVICON_PNG, media_type="image/png")
+    # FileResponse lets the server send the file itself (sendfile/pathsend
+    # where supported) instead of reading it into Python
+    if _favicon_path:
+        return FileResponse(_favicon_path, headers=_FAVICON_HEADERS)
+    return Response(content=_FAVICON_PNG, media_type="image/png", headers=_FAVICON_HEADERS)
 
 # CORS middleware
 app.add_middleware(
@@ -34,10 +50,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware for /api responses only. Photos under /uploads are
+    already compressed, and frontend assets are sent pre-compressed by
+    SPAStaticFiles (compressing those again would double-encode them)."""
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compress API responses; photo lists repeat the same keys for every row.
+# Adds Vary: Accept-Encoding and skips bodies under 1 KB.
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024)
+
 # --- UPDATED ROUTERS ---
 app.include_router(photos.router, prefix="/api", tags=["photos"])
 # --- END UPDATE ---
 
+# Registered before the "/" StaticFiles mount below: routes are matched in
+# order, and the catch-all mount would otherwise answer /api/health itself.
+@app.get("/api/health")
+async def health_check():
+    """Lightweight health check that does NOT load ML models.
+
+    Returns basic service status, whether ML models have been loaded and how
+    many photos are waiting to be tagged. This endpoint will not call load_models() and is safe for readiness probes.
+    """
+    try:
+        # Import the ml.tagger module to inspect whether models are loaded.
+        # Importing the module does not trigger model downloads; load_models() is explicit.
+        from app.ml import tagger as ml_tagger
+
+        models_loaded = ml_tagger.models_loaded()
+    except Exception:
+        models_loaded = False
+
+    return {"status": "ok", "models_loaded": models_loaded, "pending_tagging_jobs": pending_jobs()}
+
 # --- UPDATED STATIC FILE MOUNTS ---
 # Ensure the uploads directory exists before mounting StaticFiles. Mounting happens
 # at import time, so the directory must be present to avoid RuntimeError.
@@ -49,8 +101,32 @@ except Exception:
     # but we try to create it here to support typical local development workflows.
     pass
 
-# Mount static files (serves your uploads)
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+# Mount static files (serves your uploads). In production, let nginx or a CDN
+# serve uploads/ with sendfile and set SERVE_UPLOADS=false so image bytes don't
+# go through the Python event loop (see README "Deployment Notes").
+serve_uploads = os.environ.get("SERVE_UPLOADS", "true").lower() in ("1", "true", "yes")
+
+
+class UploadsStaticFiles(StaticFiles):
+    """StaticFiles for uploads/ with long-lived caching.
+
+    Uploaded photos get random UUID names and are never rewritten in place, so
+    browsers may keep them for a year without revalidating. list.json changes
+    on every upload and must always be revalidated (StaticFiles already sends
+    an ETag and answers If-None-Match with 304).
+    """
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            if path == "list.json":
+                response.headers["Cache-Control"] = "no-cache"
+            else:
+                response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+if serve_uploads:
+    app.mount("/uploads", UploadsStaticFiles(directory=uploads_dir), name="uploads")
 
 # Serve frontend static files. Prefer a production build directory `frontend/dist`
 # when present (Vite's default) and otherwise fall back to the `frontend` folder
@@ -64,39 +140,104 @@ else:
     root_static_dir = frontend_dir
     print(f"Serving frontend from source directory: {frontend_dir}")
 
-app.mount("/", StaticFiles(directory=root_static_dir, html=True), name="root")
+# A real favicon.ico in the frontend wins over the built-in placeholder.
+# Looked up once here, not on every request.
+_favicon_path = os.path.join(root_static_dir, "favicon.ico")
+if not os.path.isfile(_favicon_path):
+    _favicon_path = None
 
+# index.html is read once; restart the app after rebuilding the frontend
+_index_path = os.path.join(root_static_dir, "index.html")
+_INDEX_HTML = None
+if os.path.isfile(_index_path):
+    with open(_index_path, "rb") as f:
+        _INDEX_HTML = f.read()
 
-# SPA fallback: serve index.html for non-API paths so client-side routing works.
-@app.get("/{full_path:path}")
-async def spa_fallback(full_path: str):
-    # Let API and uploads paths be handled by their mounts/routers
-    if full_path.startswith("api") or full_path.startswith("uploads"):
-        raise HTTPException(status_code=404)
-    index_path = os.path.join(root_static_dir, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path, media_type="text/html")
-    raise HTTPException(status_code=404)
-# --- END OF UPDATES ---
 
+# Pre-compressed siblings written by the frontend build (see vite.config.js),
+# in order of preference
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+# Vite puts content-hashed bundles under dist/assets/; a changed file gets a
+# new name, so they can be cached forever
+_HASHED_ASSETS_DIR = "assets" + os.sep if root_static_dir == dist_dir else None
 
-@app.get("/api/health")
-async def health_check():
-    """Lightweight health check that does NOT load ML models.
 
-    Returns basic service status and whether ML models have been loaded.
-    This endpoint will not call load_models() and is safe for readiness probes.
+class SPAStaticFiles(StaticFiles):
+    """Frontend files, with a fallback to index.html so client-side routes
+    (e.g. /gallery) load the app.
+
+    The fallback lives here rather than in a catch-all route: the "/" mount
+    matches every path, so a route registered after it never runs. Paths
+    with a file extension (missing assets, bot scans for .php/.env) and
+    unknown api/ or uploads/ paths stay plain 404s.
+
+    When the client accepts it and the build wrote one, a file's .br or .gz
+    sibling is sent instead, with Content-Encoding set.
     """
-    try:
-        # Import the ml.tagger module to inspect whether models are loaded.
-        # Importing the module does not trigger model downloads; load_models() is explicit.
-        from app.ml import tagger as ml_tagger
+    async def get_response(self, path, scope):
+        response = await self._precompressed_response(path, scope)
+        if response is None:
+            try:
+                response = await super().get_response(path, scope)
+            except StarletteHTTPException as exc:
+                if exc.status_code != 404 or _INDEX_HTML is None or not _is_client_route(path):
+                    raise
+                return Response(_INDEX_HTML, media_type="text/html")
+        if _HASHED_ASSETS_DIR and path.startswith(_HASHED_ASSETS_DIR) and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
 
-        models_loaded = bool(getattr(ml_tagger, "blip_model", None) and getattr(ml_tagger, "clip_model", None))
-    except Exception:
-        models_loaded = False
+    async def _precompressed_response(self, path, scope):
+        accepted = _accepted_encodings(scope)
+        if not accepted:
+            return None
+        for encoding, suffix in _PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = await run_in_threadpool(self._stat_sibling, path + suffix)
+            if stat_result is None:
+                continue
+            # file_response() handles If-None-Match/304 and, since mimetypes
+            # treats .br/.gz as encodings, keeps the original file's media type
+            response = self.file_response(full_path, stat_result, scope)
+            response.headers["Vary"] = "Accept-Encoding"
+            if response.status_code == 200:
+                response.headers["Content-Encoding"] = encoding
+            return response
+        return None
+
+    def _stat_sibling(self, relative_path):
+        root = os.path.realpath(self.directory)
+        full_path = os.path.realpath(os.path.join(root, relative_path))
+        # Same containment rule as StaticFiles.lookup_path
+        if os.path.commonpath([root, full_path]) != root:
+            return full_path, None
+        try:
+            stat_result = os.stat(full_path)
+        except OSError:
+            return full_path, None
+        return full_path, stat_result if stat.S_ISREG(stat_result.st_mode) else None
+
+
+def _accepted_encodings(scope) -> set:
+    header = Headers(scope=scope).get("accept-encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding and params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(coding.lower())
+    return accepted
+
+
+def _is_client_route(path: str) -> bool:
+    # StaticFiles hands over an OS-normalised path (backslashes on Windows)
+    first = path.replace(os.sep, "/").split("/", 1)[0]
+    return first not in ("api", "uploads") and not os.path.splitext(path)[1]
+
+
+app.mount("/", SPAStaticFiles(directory=root_static_dir, html=True), name="root")
+# --- END OF UPDATES ---
 
-    return {"status": "ok", "models_loaded": models_loaded}
 
 @app.on_event("startup")
 async def startup_event():
@@ -127,14 +268,32 @@ async def startup_event():
         except Exception:
             # best-effort, don't block startup
             pass
+        try:
+            # Drop chunked uploads abandoned before the last shutdown
+            photos_api._sweep_upload_parts()
+        except Exception:
+            pass
     except Exception:
         pass
 
     # Optionally load heavy ML models on startup. Set LOAD_ML_MODELS=false in .env for faster dev startup.
     load_models_flag = os.environ.get("LOAD_ML_MODELS", "true").lower() in ("1", "true", "yes")
     if load_models_flag:
-        await load_models()
+        # Blocking on purpose: the app should not accept uploads before the
+        # models are ready
+        load_models()
+
+    # Start the thread that runs image tagging outside the event loop
+    start_worker()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_worker()
 
 if __name__ == "__main__":
     import uvicorn
+    # uvicorn picks uvloop and httptools automatically when they are installed
+    # (uvicorn[standard]; uvloop isn't available on Windows). Keep one worker
+    # process: each worker would load its own copy of the ML models.
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -2,181 +2,453 @@
 ML module for image tagging using BLIP and CLIP models
 """
 import torch
+import torch.nn.functional as F
 from PIL import Image
 from transformers import BlipProcessor, BlipForConditionalGeneration
 from transformers import CLIPProcessor, CLIPModel
 import nltk
-from nltk.tokenize import word_tokenize
-from nltk.tag import pos_tag
-from typing import List, Tuple
+from nltk.tag import PerceptronTagger
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+import hashlib
 import os
-from app.db.models import Photo as DBPhoto, Tag as DBTag
+import re
+import threading
+from app.db.models import Photo as DBPhoto, Tag as DBTag, db_session
 
 # Global model instances
 blip_model = None
 blip_processor = None
 clip_model = None
 clip_processor = None
+_models_lock = threading.Lock()
 
-async def load_models():
+# Optional torch.compile of the models (needs PyTorch 2.2+). Cuts per-call
+# Python overhead after a warm-up, but compiling takes a while at startup.
+ML_TORCH_COMPILE = os.getenv("ML_TORCH_COMPILE", "false").lower() in ("1", "true", "yes")
+ML_TORCH_COMPILE_MODE = os.getenv("ML_TORCH_COMPILE_MODE", "reduce-overhead")
+
+# Run on the GPU when there is one. Half precision halves memory traffic and
+# uses tensor cores on CUDA; on CPU fp16 is slow, so CPU stays fp32 unless
+# ML_DTYPE asks for something else (bfloat16 pays off on CPUs with AMX/AVX512-BF16).
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+_DTYPES = {"float32": torch.float32, "float16": torch.float16, "bfloat16": torch.bfloat16}
+DTYPE = _DTYPES.get(
+    os.getenv("ML_DTYPE", "float16" if DEVICE == "cuda" else "float32").lower(),
+    torch.float32
+)
+
+# transformers (4.30+) picks the checkpoint's .safetensors weights when the
+# repo has them; those are memory-mapped instead of unpickled into a second
+# copy. low_cpu_mem_usage (needs accelerate) builds the model directly from
+# the loaded weights instead of random-initialising it first, cutting peak
+# RAM and load time.
+_WEIGHT_LOAD_KWARGS = dict(torch_dtype=DTYPE, low_cpu_mem_usage=True)
+
+def models_loaded() -> bool:
+    return blip_model is not None and clip_model is not None
+
+def ensure_models_loaded():
+    """Load the models once per process; later calls return immediately.
+    Safe to call from the startup hook and the tagging worker at the same time."""
+    if models_loaded():
+        return True
+    with _models_lock:
+        if models_loaded():
+            return True
+        return _load_models()
+
+def load_models():
+    """Load BLIP and CLIP models (no-op if they are already loaded)"""
+    return ensure_models_loaded()
+
+def _load_models():
     """Load BLIP and CLIP models"""
     global blip_model, blip_processor, clip_model, clip_processor
     
     print("Loading BLIP model...")
     blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-    blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base")
+    blip_model = BlipForConditionalGeneration.from_pretrained(
+        "Salesforce/blip-image-captioning-base", **_WEIGHT_LOAD_KWARGS
+    ).to(DEVICE)
     
     print("Loading CLIP model...")
     clip_processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-    clip_model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32")
+    clip_model = CLIPModel.from_pretrained(
+        "openai/clip-vit-base-patch32", **_WEIGHT_LOAD_KWARGS
+    ).to(DEVICE)
+    print(f"Models running on {DEVICE} ({str(DTYPE).replace('torch.', '')})")
+
+    # Inference only: disable dropout and other training-time behaviour
+    blip_model.eval()
+    clip_model.eval()
+    if ML_TORCH_COMPILE:
+        _compile_models()
     # Ensure a local nltk data directory so downloads are available in the venv/project
     nltk_data_dir = os.path.join(os.getcwd(), '.nltk_data')
     os.makedirs(nltk_data_dir, exist_ok=True)
     if nltk_data_dir not in nltk.data.path:
         nltk.data.path.append(nltk_data_dir)
 
-    # Download required NLTK resources quietly into the local nltk_data dir
-    try:
-        nltk.data.find('tokenizers/punkt')
-    except LookupError:
-        nltk.download('punkt', download_dir=nltk_data_dir, quiet=True)
-
-    # Some NLTK installs expect punkt_tab; try to ensure it's available too
-    try:
-        nltk.data.find('tokenizers/punkt_tab')
-    except LookupError:
-        # punkt_tab is a different packaging on some platforms; attempt to download
+    # Only the POS tagger is needed (tokenizing is a regex). NLTK 3.9 renamed
+    # the resource to averaged_perceptron_tagger_eng, so fetch both names.
+    for resource in ('averaged_perceptron_tagger_eng', 'averaged_perceptron_tagger'):
         try:
-            nltk.download('punkt_tab', download_dir=nltk_data_dir, quiet=True)
-        except Exception:
-            # ignore if not available; fallback tokenization will handle in extract_keywords
-            pass
-
-    try:
-        nltk.data.find('taggers/averaged_perceptron_tagger')
-    except LookupError:
-        nltk.download('averaged_perceptron_tagger', download_dir=nltk_data_dir, quiet=True)
+            nltk.data.find(f'taggers/{resource}')
+        except LookupError:
+            try:
+                nltk.download(resource, download_dir=nltk_data_dir, quiet=True)
+            except Exception:
+                # ignore if not available; extract_keywords falls back to plain words
+                pass
     
     return True
 
+def _compile_models():
+    """Compile the modules inference goes through, in place, then run one
+    dummy batch so compilation happens at load time rather than on the
+    first upload"""
+    if not hasattr(torch.nn.Module, "compile"):
+        print("ML_TORCH_COMPILE is set but this PyTorch has no Module.compile(); skipping")
+        return
+    print(f"Compiling models (mode={ML_TORCH_COMPILE_MODE})...")
+    # generate() and CLIP's get_*_features() call the encoders/decoder
+    # directly, so compile those rather than the wrapper models
+    blip_model.vision_model.compile(mode=ML_TORCH_COMPILE_MODE)
+    blip_model.text_decoder.compile(mode=ML_TORCH_COMPILE_MODE)
+    clip_model.vision_model.compile(mode=ML_TORCH_COMPILE_MODE)
+    clip_model.text_model.compile(mode=ML_TORCH_COMPILE_MODE)
+
+    dummy = Image.new('RGB', (224, 224))
+    generate_captions([dummy])
+    score_tags_batch([dummy], [["photo"]])
+
+# Captions are short lowercase English; a regex split is all the tokenizing
+# they need (word_tokenize would run the Punkt sentence splitter first)
+_TOKEN_RE = re.compile(r"[a-z]+")
+_pos_tagger = None
+
+def _get_pos_tagger():
+    """Load NLTK's perceptron tagger once. nltk.pos_tag() builds a new one,
+    re-reading its model from disk, on every call."""
+    global _pos_tagger
+    if _pos_tagger is None:
+        _pos_tagger = PerceptronTagger()
+    return _pos_tagger
+
+# Candidate tags per photo; each one costs a CLIP text encode (when not
+# cached) and a tag row
+MAX_TAGS = 12
+
+# Plurals the suffix rules in _singular would get wrong, and nouns that are
+# only used in the plural (kept as they are)
+_IRREGULAR_PLURALS = {
+    'men': 'man', 'women': 'woman', 'children': 'child', 'people': 'person',
+    'feet': 'foot', 'teeth': 'tooth', 'geese': 'goose', 'mice': 'mouse',
+    'leaves': 'leaf', 'knives': 'knife', 'wives': 'wife', 'lives': 'life',
+    'wolves': 'wolf', 'shelves': 'shelf', 'halves': 'half', 'loaves': 'loaf',
+    'calves': 'calf', 'scarves': 'scarf', 'thieves': 'thief',
+    'buses': 'bus', 'gases': 'gas', 'lenses': 'lens', 'canvases': 'canvas',
+    'campuses': 'campus', 'circuses': 'circus', 'cactuses': 'cactus',
+    'octopuses': 'octopus', 'walruses': 'walrus', 'irises': 'iris',
+    'quizzes': 'quiz', 'vases': 'vase', 'cases': 'case', 'bases': 'base',
+    'tomatoes': 'tomato', 'potatoes': 'potato', 'heroes': 'hero', 'mangoes': 'mango',
+    'movies': 'movie', 'cookies': 'cookie',
+}
+_PLURAL_ONLY = frozenset((
+    'clothes', 'glasses', 'sunglasses', 'jeans', 'pants', 'trousers', 'shorts',
+    'scissors', 'stairs', 'goggles', 'binoculars', 'headphones', 'news',
+    'species', 'series', 'sheep', 'fish', 'deer',
+))
+# consonant + a/i/u + "ses": could be -s + "es" (canvases) or -se + "s" (vases)
+_AMBIGUOUS_SES = re.compile(r'[^aeiou][aiu]ses$')
+
+def _singular(word: str) -> str:
+    """Rule-of-thumb singular for a word tagged as a plural noun (NNS).
+    Words the rules can't handle are returned unchanged rather than guessed at.
+
+    >>> [_singular(w) for w in ('dogs', 'puppies', 'benches', 'buses', 'boxes')]
+    ['dog', 'puppy', 'bench', 'bus', 'box']
+    >>> [_singular(w) for w in ('quizzes', 'buzzes', 'canvases', 'houses', 'horses')]
+    ['quiz', 'buzz', 'canvas', 'house', 'horse']
+    >>> [_singular(w) for w in ('leaves', 'clothes', 'glasses', 'waltzes', 'fuses')]
+    ['leaf', 'clothes', 'glasses', 'waltz', 'fuses']
+    """
+    if word in _PLURAL_ONLY:
+        return word
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('ches', 'shes', 'sses', 'xes', 'zzes', 'tzes')):
+        return word[:-2]
+    # Not listed above and ambiguous: -ses after a short vowel (canvases/vases),
+    # -ves (gloves/leaves) and -oes (shoes/tomatoes). Keep them whole.
+    if _AMBIGUOUS_SES.search(word):
+        return word
+    if word.endswith(('ves', 'oes')) and word not in ('shoes', 'toes', 'canoes'):
+        return word
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+def _top_keywords(words: List[str]) -> List[str]:
+    """Distinct words, most frequent first (ties keep caption order), capped
+    at MAX_TAGS"""
+    counts = Counter(words)
+    ordered = sorted(dict.fromkeys(words), key=lambda word: -counts[word])
+    return ordered[:MAX_TAGS]
+
 def extract_keywords(caption: str) -> List[str]:
-    """Extract relevant keywords from caption text"""
-    # Tokenize and tag parts of speech. If NLTK resources are missing, fall back to simple heuristics.
+    """Extract relevant keywords from caption text.
+
+    Keywords are lowercase and plural nouns are reduced to their singular,
+    so "Dogs" and "dog" become one tag before CLIP ever sees them."""
+    tokens = _TOKEN_RE.findall(caption.lower())
+    # Tag parts of speech. If NLTK resources are missing, fall back to simple heuristics.
     try:
-        tokens = word_tokenize(caption.lower())
-        tagged = pos_tag(tokens)
+        tagged = _get_pos_tagger().tag(tokens)
+    except LookupError:
+        # NLTK tagger data missing — fall back to plain word extraction
+        return _top_keywords([word for word in tokens if len(word) > 2])
 
-        # Keep nouns and adjectives as potential tags
-        keywords = []
-        for word, tag in tagged:
-            # NN* for nouns, JJ* for adjectives
-            if tag.startswith(('NN', 'JJ')) and len(word) > 2:
-                keywords.append(word)
+    # Keep nouns and adjectives as potential tags
+    keywords = []
+    for word, tag in tagged:
+        if tag == 'NNS':
+            word = _singular(word)
+        # NN* for nouns, JJ* for adjectives
+        if tag.startswith(('NN', 'JJ')) and len(word) > 2:
+            keywords.append(word)
 
-        return list(dict.fromkeys(keywords))  # Remove duplicates while preserving order
-    except LookupError:
-        # NLTK data missing for tokenizers/taggers — fall back to simple regex word extraction
-        import re
-        words = re.findall(r"\b[a-z]{3,}\b", caption.lower())
-        # Return unique words
-        return list(dict.fromkeys(words))
+    return _top_keywords(keywords)
 
-async def generate_caption(image_path: str) -> str:
-    """Generate image caption using BLIP"""
+# Largest input either model takes (BLIP resizes to 384x384, CLIP to 224)
+_MODEL_INPUT_SIZE = (384, 384)
+
+def _decode_image(fp) -> Image.Image:
+    """Decode an image for the models. JPEGs are decoded by libjpeg at a
+    reduced scale (1/2 to 1/8) when they are much larger than the models'
+    input, which skips most of the decoding work on phone photos; the result
+    is never smaller than _MODEL_INPUT_SIZE."""
+    image = Image.open(fp)
+    image.draft('RGB', _MODEL_INPUT_SIZE)
+    return image.convert('RGB')
+
+def _open_image(image_path: str) -> Image.Image:
+    return _decode_image(image_path)
+
+def _to_model(inputs) -> dict:
+    """Move processor output to the models' device; pixel values also take
+    the models' dtype, token ids stay integers"""
+    return {
+        k: v.to(DEVICE, dtype=DTYPE) if v.is_floating_point() else v.to(DEVICE)
+        for k, v in inputs.items()
+    }
+
+# Captions only feed keyword extraction, so greedy decoding is plenty: no
+# beam search or sampling, KV cache on, and a hard cap on caption length
+CAPTION_GENERATE_KWARGS = dict(
+    max_new_tokens=int(os.getenv("ML_CAPTION_MAX_TOKENS", 20)),
+    num_beams=1,
+    do_sample=False,
+    use_cache=True,
+)
+
+@torch.inference_mode()
+def generate_captions(images: List[Image.Image]) -> List[str]:
+    """Caption several images with one BLIP generate() call"""
     if not blip_model or not blip_processor:
         raise RuntimeError("BLIP model not loaded")
     
-    # Load and preprocess image
-    image = Image.open(image_path).convert('RGB')
-    inputs = blip_processor(image, return_tensors="pt")
+    # The processor resizes every image to the same size, so they stack
+    # into a single batch tensor
+    inputs = _to_model(blip_processor(images=images, return_tensors="pt"))
     
-    # Generate caption
-    outputs = blip_model.generate(**inputs)
-    caption = blip_processor.decode(outputs[0], skip_special_tokens=True)
+    # Generate captions
+    outputs = blip_model.generate(**inputs, **CAPTION_GENERATE_KWARGS)
+    return blip_processor.batch_decode(outputs, skip_special_tokens=True)
+
+def generate_caption(image_path: str) -> str:
+    """Generate image caption using BLIP"""
+    return generate_captions([_open_image(image_path)])[0]
+
+def _rank_tags(tags: List[str], probs) -> List[Tuple[str, float]]:
+    # Pair tags with their confidence scores
+    scored_tags = [(tag, float(prob)) for tag, prob in zip(tags, probs)]
     
-    return caption
+    # Sort by confidence and filter low-confidence tags
+    scored_tags.sort(key=lambda x: x[1], reverse=True)
+    return [(tag, score) for tag, score in scored_tags if score > 0.1]
 
-async def score_tags(image_path: str, tags: List[str]) -> List[Tuple[str, float]]:
-    """Score tags using CLIP"""
+# Normalized CLIP text embeddings per tag. Captions keep producing the same
+# few hundred words, so most tags skip the text encoder entirely. Only the
+# tagging worker thread touches it.
+_TEXT_EMBED_CACHE_SIZE = 4096
+_text_embeds = OrderedDict()
+
+def _tag_text_embeddings(tags: List[str]) -> torch.Tensor:
+    """(len(tags), dim) normalized text embeddings, encoding only the tags
+    that aren't cached yet, in one batch"""
+    missing = [tag for tag in tags if tag not in _text_embeds]
+    if missing:
+        inputs = _to_model(clip_processor(
+            text=[f"a photo of {tag}" for tag in missing],
+            return_tensors="pt",
+            padding=True
+        ))
+        features = F.normalize(clip_model.get_text_features(**inputs).float(), dim=-1)
+        for tag, feature in zip(missing, features):
+            _text_embeds[tag] = feature
+    for tag in tags:
+        _text_embeds.move_to_end(tag)
+    embeddings = torch.stack([_text_embeds[tag] for tag in tags])
+    while len(_text_embeds) > _TEXT_EMBED_CACHE_SIZE:
+        _text_embeds.popitem(last=False)
+    return embeddings
+
+@torch.inference_mode()
+def score_tags_batch(images: List[Image.Image], tag_lists: List[List[str]]) -> List[List[Tuple[str, float]]]:
+    """Score each image's candidate tags using CLIP, for all images at once.
+
+    Each image goes through the vision encoder once and each distinct tag
+    through the text encoder at most once; similarities are then a single
+    matrix product, as in CLIPModel.forward. Each image's softmax is taken
+    over its own tags only, which gives the same scores as scoring the images
+    one by one.
+    """
     if not clip_model or not clip_processor:
         raise RuntimeError("CLIP model not loaded")
     
-    # Load and preprocess image
-    image = Image.open(image_path).convert('RGB')
-    
-    # Prepare text descriptions
-    text_inputs = [f"a photo of {tag}" for tag in tags]
+    texts = list(dict.fromkeys(tag for tags in tag_lists for tag in tags))
+    if not texts:
+        return [[] for _ in images]
+    column = {tag: i for i, tag in enumerate(texts)}
     
-    # Process inputs
-    inputs = clip_processor(
-        text=text_inputs,
-        images=[image] * len(tags),
-        return_tensors="pt",
-        padding=True
-    )
+    image_inputs = _to_model(clip_processor(images=images, return_tensors="pt"))
+    image_embeds = F.normalize(clip_model.get_image_features(**image_inputs).float(), dim=-1)
+    text_embeds = _tag_text_embeddings(texts)
     
-    # Get similarity scores
-    outputs = clip_model(**inputs)
-    logits_per_image = outputs.logits_per_image
-    probs = logits_per_image.softmax(dim=1)
-    
-    # Pair tags with their confidence scores
-    scored_tags = [(tag, float(prob)) for tag, prob in zip(tags, probs[0])]
+    # Similarity of every image to every tag text: (n_images, n_texts), in fp32
+    logits_per_image = image_embeds @ text_embeds.T * clip_model.logit_scale.exp().float()
     
-    # Sort by confidence and filter low-confidence tags
-    scored_tags.sort(key=lambda x: x[1], reverse=True)
-    return [(tag, score) for tag, score in scored_tags if score > 0.1]
+    results = []
+    for logits, tags in zip(logits_per_image, tag_lists):
+        if not tags:
+            results.append([])
+            continue
+        probs = logits[[column[tag] for tag in tags]].softmax(dim=0)
+        results.append(_rank_tags(tags, probs))
+    return results
 
-async def process_image(photo_id: int, file_path: str):
-    """Process an image through the ML pipeline"""
+def score_tags(image_path: str, tags: List[str]) -> List[Tuple[str, float]]:
+    """Score tags using CLIP"""
+    return score_tags_batch([_open_image(image_path)], [tags])[0]
+
+# Caption and scored tags of recently processed images, keyed by a hash of
+# the file bytes. BLIP/CLIP output only depends on the image (the models are
+# fixed for the life of the process), so identical images skip inference.
+# Only the tagging worker thread touches it.
+_RESULT_CACHE_SIZE = 1024
+_result_cache = OrderedDict()
+
+def _cached_result(digest: bytes):
+    result = _result_cache.get(digest)
+    if result is not None:
+        _result_cache.move_to_end(digest)
+    return result
+
+def _remember_result(digest: bytes, caption: str, scored_tags: List[Tuple[str, float]]):
+    _result_cache[digest] = (caption, scored_tags)
+    _result_cache.move_to_end(digest)
+    if len(_result_cache) > _RESULT_CACHE_SIZE:
+        _result_cache.popitem(last=False)
+
+def _save_results(photo_id: int, caption: str, scored_tags: List[Tuple[str, float]]):
+    """Persist caption and tags to the database on one connection, in one
+    transaction: the caption and the new tag set land together"""
     try:
-        # Generate caption
-        caption = await generate_caption(file_path)
-        print(f"Caption generated: {caption}")
-        
-        # Extract keywords from caption
-        keywords = extract_keywords(caption)
-        print(f"Keywords extracted: {keywords}")
-        
-        # Score tags with CLIP
-        scored_tags = await score_tags(file_path, keywords)
-        print(f"Tags scored: {scored_tags}")
-        
-        # Persist caption and tags to the database
+        with db_session() as conn:
+            # Get photo from database
+            photo = DBPhoto.get_by_id(photo_id, include_tags=False, conn=conn)
+            if not photo:
+                print(f"Photo id={photo_id} not found in DB")
+            else:
+                # Update caption and mark tags_generated
+                DBPhoto.update(photo_id, caption=caption, tags_generated=1, conn=conn)
+            
+                # normalize tags, keeping the best score per name
+                confidences = {}
+                for tag_name, confidence in scored_tags:
+                    confidences.setdefault(tag_name.strip().lower(), float(confidence))
+
+                # Resolve all tag ids in one go, then replace the photo's tags in one write
+                tag_ids = DBTag.resolve_ids(confidences, conn=conn)
+                pairs = [(tag_ids[name], confidence) for name, confidence in confidences.items()]
+                DBTag.add_many_to_photo(photo_id, pairs, replace=True, conn=conn)
+    except Exception as e:
+        print(f"DB persist error for photo {photo_id}: {e}")
+
+# Read size when hashing an image file (same as the API's upload chunk size)
+_HASH_READ_SIZE = 1024 * 1024
+
+def process_images(jobs: List[Tuple[int, str]]) -> Dict[int, List[Tuple[str, float]]]:
+    """Process several (photo_id, file_path) jobs through the ML pipeline,
+    running BLIP and CLIP once for the whole batch.
+
+    Blocking (CPU/GPU-bound); runs on the tagging worker thread, never on the
+    event loop. Images that can't be read are logged and skipped. Returns the
+    scored tags per photo id."""
+    photo_ids, digests, images = [], [], []
+    results = {}
+    for photo_id, file_path in jobs:
         try:
-                # Get photo from database
-                photo = DBPhoto.get_by_id(photo_id)
-                if not photo:
-                    print(f"Photo id={photo_id} not found in DB")
-                else:
-                    # Update caption and mark tags_generated
-                    DBPhoto.update(photo_id, caption=caption, tags_generated=1)
-                
-                    # Clear existing tag associations by deleting them
-                    # Get connection to delete photo_tags entries
-                    from app.db.models import get_connection, get_standard_cursor
-                    conn = get_connection()
-                    cursor = get_standard_cursor(conn)
-                    try:
-                        cursor.execute("DELETE FROM photo_tags WHERE photo_id = %s", (photo_id,))
-                        conn.commit()
-                    finally:
-                        cursor.close()
-                        conn.close()
-                
-                    # Insert/associate tags and confidences
-                    for tag_name, confidence in scored_tags:
-                        # normalize tag
-                        name = tag_name.strip().lower()
-                        tag = DBTag.get_or_create(name)
-                    
-                        # Add tag to photo with confidence
-                        DBTag.add_to_photo(photo_id, tag.id, float(confidence))
+            with open(file_path, 'rb') as f:
+                # Hashed in fixed-size reads so a large original is never
+                # held in memory whole
+                hasher = hashlib.blake2b(digest_size=16)
+                for block in iter(lambda: f.read(_HASH_READ_SIZE), b''):
+                    hasher.update(block)
+                digest = hasher.digest()
+                cached = _cached_result(digest)
+                if cached is not None:
+                    # Same image bytes as an earlier job (e.g. a re-upload)
+                    caption, scored_tags = cached
+                    print(f"Photo {photo_id}: reusing results for identical image")
+                    _save_results(photo_id, caption, scored_tags)
+                    results[photo_id] = scored_tags
+                    continue
+                # Decoded once, from the same open file (with draft downscaling);
+                # BLIP and CLIP both work from this image
+                f.seek(0)
+                images.append(_decode_image(f))
+            digests.append(digest)
+            photo_ids.append(photo_id)
         except Exception as e:
-            print(f"DB persist error for photo {photo_id}: {e}")
+            print(f"Error processing image {photo_id}: {str(e)}")
+    if not images:
+        return results
+
+    # Generate captions
+    captions = generate_captions(images)
+    
+    # Extract keywords from captions
+    keyword_lists = [extract_keywords(caption) for caption in captions]
+    
+    # Score tags with CLIP
+    scored = score_tags_batch(images, keyword_lists)
+
+    for photo_id, digest, caption, keywords, scored_tags in zip(photo_ids, digests, captions, keyword_lists, scored):
+        print(f"Photo {photo_id}: caption={caption!r} keywords={keywords} tags={scored_tags}")
+        _remember_result(digest, caption, scored_tags)
+        _save_results(photo_id, caption, scored_tags)
+        results[photo_id] = scored_tags
+    return results
 
-        return scored_tags
-        
+def process_image(photo_id: int, file_path: str):
+    """Process an image through the ML pipeline"""
+    try:
+        return process_images([(photo_id, file_path)]).get(photo_id, [])
     except Exception as e:
         print(f"Error processing image {photo_id}: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,96 @@
+"""
+Background worker that runs the ML tagging pipeline off the API's event loop
+"""
+import os
+import queue
+import threading
+import time
+
+from app.ml.tagger import ensure_models_loaded, process_images
+
+# Pending (photo_id, file_path) jobs. A single dedicated thread drains it, so
+# CPU-heavy BLIP/CLIP inference never runs on the event loop or ties up the
+# request threadpool.
+_jobs = queue.Queue()
+_worker_thread = None
+_worker_lock = threading.Lock()
+_STOP = object()
+
+# Jobs that arrive close together are tagged as one batch, so BLIP and CLIP
+# run a single forward pass for several photos. After the first job the worker
+# waits at most TAGGING_MAX_WAIT_MS for more, up to TAGGING_MAX_BATCH photos.
+TAGGING_MAX_BATCH = max(int(os.getenv('TAGGING_MAX_BATCH', 8)), 1)
+TAGGING_MAX_WAIT = float(os.getenv('TAGGING_MAX_WAIT_MS', 50)) / 1000
+
+
+def _next_batch():
+    """Block for one job, then collect whatever else arrives within the wait
+    window. Returns (jobs, stop_requested)."""
+    job = _jobs.get()
+    if job is _STOP:
+        return [], True
+    batch = [job]
+    deadline = time.monotonic() + TAGGING_MAX_WAIT
+    while len(batch) < TAGGING_MAX_BATCH:
+        remaining = deadline - time.monotonic()
+        try:
+            job = _jobs.get(timeout=remaining) if remaining > 0 else _jobs.get_nowait()
+        except queue.Empty:
+            break
+        if job is _STOP:
+            return batch, True
+        batch.append(job)
+    return batch, False
+
+
+def _run():
+    while True:
+        batch, stop = _next_batch()
+        try:
+            if batch:
+                try:
+                    # Models are process-wide singletons: loaded at startup, or on
+                    # the first job when LOAD_ML_MODELS=false
+                    ensure_models_loaded()
+                    process_images(batch)
+                except Exception as e:
+                    # process_images already logs per-image problems; keep the worker alive
+                    photo_ids = [photo_id for photo_id, _ in batch]
+                    print(f"Tagging jobs for photos {photo_ids} failed: {e}")
+        finally:
+            for _ in range(len(batch) + int(stop)):
+                _jobs.task_done()
+        if stop:
+            return
+
+
+def start_worker():
+    """Start the tagging worker thread if it isn't running yet"""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_run, name="tagging-worker", daemon=True)
+        _worker_thread.start()
+
+
+def stop_worker(timeout: float = 5.0):
+    """Ask the worker to exit once the jobs queued so far are done"""
+    global _worker_thread
+    with _worker_lock:
+        thread = _worker_thread
+        _worker_thread = None
+    if thread is not None and thread.is_alive():
+        _jobs.put(_STOP)
+        thread.join(timeout)
+
+
+def enqueue(photo_id: int, file_path: str):
+    """Queue a photo for captioning and tagging. Returns immediately."""
+    start_worker()
+    _jobs.put((photo_id, file_path))
+
+
+def pending_jobs() -> int:
+    """Approximate number of photos queued for tagging (reported by /api/health)"""
+    return _jobs.qsize()
@@ -1,8 +1,44 @@
 import { defineConfig } from 'vite'
 import react from '@vitejs/plugin-react'
+import { readdir, readFile, writeFile } from 'node:fs/promises'
+import { extname, join, resolve } from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+// Write .br and .gz copies of text assets next to the originals, so the
+// backend can send them as-is instead of compressing on every request
+function precompress() {
+  const extensions = new Set(['.js', '.css', '.html', '.svg', '.json'])
+  let outDir
+  const walk = async (dir) => {
+    for (const entry of await readdir(dir, { withFileTypes: true })) {
+      const path = join(dir, entry.name)
+      if (entry.isDirectory()) {
+        await walk(path)
+        continue
+      }
+      if (!extensions.has(extname(path))) continue
+      const data = await readFile(path)
+      if (data.length < 1024) continue
+      await writeFile(`${path}.br`, brotliCompressSync(data, {
+        params: { [constants.BROTLI_PARAM_QUALITY]: 11 },
+      }))
+      await writeFile(`${path}.gz`, gzipSync(data, { level: 9 }))
+    }
+  }
+  return {
+    name: 'precompress',
+    apply: 'build',
+    configResolved(config) {
+      outDir = resolve(config.root, config.build.outDir)
+    },
+    async closeBundle() {
+      await walk(outDir)
+    },
+  }
+}
 
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), precompress()],
   server: {
     port: 5173,
     proxy: {